@@ -0,0 +1,73 @@
+"""
+Compare the resi PDF417 barcode rasteriser with the previous
+scale-10 / resize / rotate pipeline on the `generate_dummy_order_long` fixtures.
+
+Usage: python bench_barcode.py [n_orders]
+"""
+
+import sys
+import time
+import random
+from io import BytesIO
+from pdf417 import encode, render_image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from pdf_orderanku_module import (
+    generate_dummy_order_long,
+    get_barcode_text,
+    pad_barcode_text,
+    create_pdf417_barcode,
+)
+
+
+def create_pdf417_barcode_scaled(data_str):
+    # Previous implementation, kept here as the benchmark baseline
+    codes = encode(pad_barcode_text(data_str))
+    image = render_image(codes, scale=10, ratio=1, padding=2)
+    resized_image = image.resize((350, 100))
+    return resized_image.rotate(-90, expand=True)
+
+
+def draw_inline(images):
+    p = canvas.Canvas(BytesIO(), pagesize=A4)
+    for image in images:
+        p.drawInlineImage(image, 72, 72, width=100 / 2.75, height=350 / 2.75)
+        p.drawInlineImage(image, 300, 72, width=100 / 2.75, height=350 / 2.75)
+        p.showPage()
+    p.save()
+
+
+def draw_xobject(images):
+    p = canvas.Canvas(BytesIO(), pagesize=A4)
+    for image in images:
+        image = ImageReader(image)
+        p.drawImage(image, 72, 72, width=100 / 2.75, height=350 / 2.75)
+        p.drawImage(image, 300, 72, width=100 / 2.75, height=350 / 2.75)
+        p.showPage()
+    p.save()
+
+
+def bench(label, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    print(f"{label:<32}{time.perf_counter() - start:8.3f}s")
+    return result
+
+
+if __name__ == "__main__":
+    n_orders = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    random.seed(0)
+    texts = [get_barcode_text(generate_dummy_order_long()) for _ in range(n_orders)]
+
+    scaled = bench("scaled: barcodes", list, map(create_pdf417_barcode_scaled, texts))
+    direct = bench("direct: barcodes", list, map(create_pdf417_barcode, texts))
+
+    for label, images in (("scaled", scaled), ("direct", direct)):
+        width, height = images[0].size
+        print(f"{label + ': pixels per barcode':<32}{width * height:>9}")
+
+    bench("scaled: draw (inline x2)", draw_inline, scaled)
+    bench("direct: draw (xobject x2)", draw_xobject, direct)
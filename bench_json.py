@@ -0,0 +1,116 @@
+"""
+Compare JSON encoding of order list payloads: FastAPI's default path
+(`jsonable_encoder` + `JSONResponse`) against `FastJSONResponse` on ORM
+instances and on projected rows.
+
+Runs against an in-memory SQLite copy of the order_tm shape, no database
+credentials needed.
+
+Usage: python bench_json.py [n_orders]
+"""
+
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import Column, DateTime, Integer, Numeric, String, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+from json_response import FastJSONResponse
+
+Base = declarative_base()
+
+
+class BenchOrder(Base):
+    __tablename__ = "order_tm"
+
+    id = Column(Integer, primary_key=True)
+    ecommerce_code = Column(String(1))
+    ecom_order_id = Column(String(32))
+    ecom_order_status = Column(String(16))
+    internal_status_id = Column(String(3))
+    invoice_ref = Column(String(64))
+    cust_phone_no = Column(String(32))
+    user_deadline_prd = Column(String(8))
+    google_folder_url = Column(String(255))
+    google_file_url = Column(String(255))
+    thumb_url = Column(String(255))
+    feeding_dt = Column(DateTime)
+    pltf_deadline_dt = Column(DateTime)
+    initial_input_dt = Column(DateTime)
+    design_sub_dt = Column(DateTime)
+    design_acc_dt = Column(DateTime)
+    print_done_dt = Column(DateTime)
+    packing_done_dt = Column(DateTime)
+    last_updated_ts = Column(DateTime)
+    order_total = Column(Numeric(12, 2))
+    pic_user_id = Column(Integer)
+    batchfile_id = Column(Integer)
+
+
+def make_orders(n_orders):
+    now = datetime.now()
+    for i in range(1, n_orders + 1):
+        yield BenchOrder(
+            id=i,
+            ecommerce_code="X",
+            ecom_order_id=f"X{i:010d}",
+            ecom_order_status="220",
+            internal_status_id=random.choice(["000", "100", "200", "250", "300"]),
+            invoice_ref=f"INV/{i:08d}",
+            cust_phone_no=f"0812{random.randint(10**7, 10**8 - 1)}",
+            user_deadline_prd="20260131",
+            google_folder_url=f"https://drive.google.com/drive/folders/{i:033d}",
+            google_file_url=f"https://drive.google.com/file/d/{i:033d}/view",
+            feeding_dt=now - timedelta(minutes=i),
+            pltf_deadline_dt=now + timedelta(days=3),
+            initial_input_dt=now,
+            last_updated_ts=now,
+            order_total=Decimal(random.randint(10000, 5000000)) / 100,
+            pic_user_id=random.choice([None, 1, 2, 3]),
+        )
+
+
+def bench(label, fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<40}{best * 1000:9.1f} ms {len(result):>10} bytes")
+    return result
+
+
+def encode_default(orders):
+    # What FastAPI does for a returned list of ORM objects
+    return JSONResponse(jsonable_encoder(orders)).body
+
+
+def encode_orm(orders):
+    return FastJSONResponse(orders).body
+
+
+def encode_rows(rows):
+    return FastJSONResponse(rows).body
+
+
+if __name__ == "__main__":
+    n_orders = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add_all(make_orders(n_orders))
+        db.commit()
+
+        orders = db.query(BenchOrder).all()
+        rows = db.query(*BenchOrder.__table__.columns).all()
+
+        print(f"{n_orders} orders")
+        bench("jsonable_encoder + JSONResponse (ORM)", encode_default, orders)
+        bench("FastJSONResponse (ORM)", encode_orm, orders)
+        bench("FastJSONResponse (projected rows)", encode_rows, rows)
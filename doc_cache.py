@@ -0,0 +1,102 @@
+import os
+import json
+import glob
+import hashlib
+import threading
+
+DOC_CACHE_DIR = os.environ.get("HCX_DOC_CACHE_DIR", "cache/docs")
+DOC_CACHE_MAX_BYTES = int(os.environ.get("HCX_DOC_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Bump when the invoice layout or template assets change so old renders are dropped
+DOC_CACHE_VERSION = 1
+
+_lock = threading.Lock()
+
+
+def get_doc_hash(invoice_data):
+    """
+    Hash the render input of an invoice/quotation document.
+
+    Parameters
+    ----------
+    invoice_data : dict
+        The output of `get_invoice_data_by_orderdocid`.
+
+    Returns
+    -------
+    str
+        Hex sha256 digest, used both as cache key and as ETag.
+    """
+    payload = json.dumps(
+        [DOC_CACHE_VERSION, invoice_data], sort_keys=True, default=str
+    ).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _doc_path(doc_id, doc_hash):
+    return os.path.join(DOC_CACHE_DIR, f"{doc_id}-{doc_hash}.pdf")
+
+
+def get_cached_doc(doc_id, doc_hash):
+    path = _doc_path(doc_id, doc_hash)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+
+    # mtime doubles as the LRU clock
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+    return data
+
+
+def put_cached_doc(doc_id, doc_hash, data):
+    os.makedirs(DOC_CACHE_DIR, exist_ok=True)
+    path = _doc_path(doc_id, doc_hash)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+    _evict()
+
+
+def invalidate_doc(doc_id):
+    with _lock:
+        for path in glob.glob(os.path.join(DOC_CACHE_DIR, f"{doc_id}-*.pdf")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _evict():
+    with _lock:
+        entries = []
+        total_size = 0
+        for path in glob.glob(os.path.join(DOC_CACHE_DIR, "*.pdf")):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total_size += st.st_size
+
+        if total_size <= DOC_CACHE_MAX_BYTES:
+            return
+
+        # Oldest access first
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= DOC_CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
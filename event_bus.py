@@ -0,0 +1,157 @@
+import os
+import asyncio
+import threading
+from datetime import datetime
+from fastapi import HTTPException, status
+
+# Events waiting for a slow subscriber; past this it gets a "resync" event
+EVENT_QUEUE_SIZE = int(os.environ.get("HCX_EVENT_QUEUE_SIZE", 256))
+EVENT_MAX_SUBSCRIBERS = int(os.environ.get("HCX_EVENT_MAX_SUBSCRIBERS", 500))
+EVENT_KEEPALIVE_SECONDS = 15
+
+TOPIC_ORDER = "order"
+TOPIC_ORDERANKU = "orderanku"
+
+# Status buckets of the order board, see api_order.get_order_bucket_filter
+ORDER_BUCKET_STATUSES = {"admin": {"000", "200"}}
+
+
+class Subscription:
+    """
+    Event queue of one WebSocket/SSE client, lives on the client's event loop.
+    """
+
+    def __init__(self, bus, loop, matches):
+        self.bus = bus
+        self.loop = loop
+        self.matches = matches
+        self.queue = asyncio.Queue(EVENT_QUEUE_SIZE)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind, drop the backlog and let the client reload
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"topic": event["topic"], "action": "resync"})
+
+    async def get(self, timeout=None):
+        """Next event, None when nothing arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    In-process fan-out of order board changes to WebSocket/SSE subscribers.
+
+    `publish` may be called from any thread (sync endpoints run in the
+    threadpool); events are handed to each subscriber's loop. Events only
+    reach clients connected to the same server process, clients still catch
+    up through `/api_order/changes` after a reconnect or a "resync" event.
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, matches):
+        """
+        Register a subscriber on the running loop.
+
+        Parameters
+        ----------
+        matches : callable
+            `matches(event)` tells whether the subscriber wants the event.
+
+        Raises
+        ------
+        HTTPException
+            503 when there are already `EVENT_MAX_SUBSCRIBERS` subscribers.
+        """
+        subscription = Subscription(self, asyncio.get_running_loop(), matches)
+        with self._lock:
+            if len(self._subscriptions) >= EVENT_MAX_SUBSCRIBERS:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many event subscribers, please poll instead",
+                )
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            if not subscription.matches(event):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, event)
+            except RuntimeError:
+                # The subscriber's loop is closed
+                self.unsubscribe(subscription)
+
+
+event_bus = EventBus()
+
+
+def make_event(topic, action, ids, **fields):
+    return {
+        "topic": topic,
+        "action": action,
+        "ids": list(ids),
+        "ts": datetime.now().isoformat(),
+        **fields,
+    }
+
+
+def order_event(action, order_ids, from_status=None, to_status=None, batchfile_id=None):
+    return make_event(
+        TOPIC_ORDER,
+        action,
+        order_ids,
+        from_status=from_status,
+        to_status=to_status,
+        batchfile_id=batchfile_id,
+    )
+
+
+def publish_orderanku_event(action, order_ids):
+    event_bus.publish(make_event(TOPIC_ORDERANKU, action, order_ids))
+
+
+def make_event_filter(topic, bucket=None, batchfile_id=None):
+    """
+    Subscriber filter: events of `topic`, for orders optionally only those
+    entering or leaving the status `bucket` (`admin` or a status id) or
+    touching `batchfile_id`. Other buckets (`last_3_months`, `active`) are
+    not status based and get every order event.
+    """
+    bucket_statuses = None
+    if bucket is not None and bucket not in ("last_3_months", "active"):
+        bucket_statuses = ORDER_BUCKET_STATUSES.get(bucket, {bucket})
+
+    def matches(event):
+        if event["topic"] != topic:
+            return False
+        if batchfile_id is not None and event.get("batchfile_id") != batchfile_id:
+            return False
+        if bucket_statuses is not None:
+            # Status unknown counts as a possible change
+            statuses = {event.get("from_status"), event.get("to_status")}
+            if statuses != {None} and not statuses & bucket_statuses:
+                return False
+        return True
+
+    return matches
@@ -15,16 +15,24 @@ from routers import (
     api_sync,
     api_docs,
     api_orderanku,
+    api_events,
 )
 from database import get_db
 from database import Order_TM, HCXProcessSyncStatus_TM, User_TM
 from pydantic import BaseModel
+from pdf_assets import load_assets
+from render_executor import shutdown_render_executor
+from search_index import start_search_index
+from json_response import FastJSONResponse
+from pagination import ListParams, get_list_page
+from routers.api_order import ORDER_SORT_FIELDS
+from routers.user import USER_SORT_FIELDS
 
 from _cred import AuthSecret
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 origins = [
     "http://localhost",
@@ -55,6 +63,7 @@ app.include_router(api_order.router, prefix=API_PREFIX)
 app.include_router(api_sync.router, prefix=API_PREFIX)
 app.include_router(api_docs.router, prefix=API_PREFIX)
 app.include_router(api_orderanku.router, prefix=API_PREFIX)
+app.include_router(api_events.router, prefix=API_PREFIX)
 
 
 # region AuthJWT
@@ -78,21 +87,36 @@ def authjwt_exception_handler(request: Request, exc: AuthJWTException):
 # endregion
 
 
+@app.on_event("startup")
+def load_pdf_assets():
+    load_assets()
+
+
+@app.on_event("startup")
+def build_search_index():
+    start_search_index()
+
+
+@app.on_event("shutdown")
+def stop_render_executor():
+    shutdown_render_executor()
+
+
 @app.get(API_PREFIX + "/")
 async def root():
     return {"message": "Hello World"}
 
 
 @app.get(API_PREFIX + "/orders")
-async def get_all_orders(db: Session = Depends(get_db)):
-    res = db.query(Order_TM).all()
-    return res
+def get_all_orders(params: ListParams = Depends(), db: Session = Depends(get_db)):
+    res = get_list_page(db, Order_TM, params, ORDER_SORT_FIELDS)
+    return FastJSONResponse(res)
 
 
 @app.get(API_PREFIX + "/users")
-async def get_all_users(db: Session = Depends(get_db)):
-    res = db.query(User_TM).all()
-    return res
+def get_all_users(params: ListParams = Depends(), db: Session = Depends(get_db)):
+    res = get_list_page(db, User_TM, params, USER_SORT_FIELDS)
+    return FastJSONResponse(res)
 
 
 @app.get(API_PREFIX + "/syncstatus")
@@ -0,0 +1,5 @@
+-- Covering index for the latest invoice/quote lookups of /api_docs/inquiry
+-- (routers/api_docs.py get_latest_doc_ids): MAX(CASE ...) grouped by order_id
+-- is answered from the index without reading the document rows.
+CREATE INDEX ix_orderdocument_order_type_id
+    ON orderdocument_tm (order_id, doc_type, id);
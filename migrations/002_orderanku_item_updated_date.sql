@@ -0,0 +1,7 @@
+-- Edit time of the Orderanku search fields, set by edit_order. The in-memory
+-- search index (search_index.py, HCX_SEARCH_BACKEND=memory) re-checks rows
+-- edited since its last build, so edits made by other server processes are
+-- found too. The index stays disabled until this column exists.
+ALTER TABLE orderanku_item_tm
+    ADD updated_date DATETIME NULL,
+    ADD INDEX ix_orderanku_item_updated_date (updated_date);
@@ -0,0 +1,345 @@
+import json
+import time
+import base64
+import binascii
+import datetime
+import threading
+from decimal import Decimal
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+# Cached totals for cursor pagination, keyed by the filtered query
+COUNT_CACHE_TTL = 60
+COUNT_CACHE_SIZE = 1024
+
+# Page size bounds of the list endpoints (`ListParams`)
+LIST_DEFAULT_LIMIT = 100
+LIST_MAX_LIMIT = 1000
+
+_count_cache = {}
+_count_cache_lock = threading.Lock()
+
+
+# region Cursor
+def _dump_value(value):
+    if isinstance(value, datetime.datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"dec": str(value)}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return datetime.date.fromisoformat(value["d"])
+        if "dec" in value:
+            return Decimal(value["dec"])
+    return value
+
+
+def encode_cursor(sort_key, descending, direction, value, last_id):
+    payload = [sort_key, int(descending), direction, _dump_value(value), last_id]
+    data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort_key, descending):
+    """
+    Decode a cursor made by `encode_cursor`.
+
+    Raises
+    ------
+    HTTPException
+        400 when the cursor is malformed (including an unknown direction) or
+        was issued for another sort.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        c_sort_key, c_descending, direction, value, last_id = json.loads(data)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+    # Anything but "next" would walk backwards without reversing the rows
+    if direction not in ("next", "prev"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+    if c_sort_key != sort_key or bool(c_descending) != descending:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor was issued for another sort order",
+        )
+
+    return direction, _load_value(value), last_id
+
+
+# endregion
+
+
+def _after(sort_column, id_column, value, last_id, descending):
+    # Rows strictly after (value, last_id) in ORDER BY sort_column, id_column.
+    # MySQL sorts NULL lowest: first when ascending, last when descending.
+    if descending:
+        if value is None:
+            return and_(sort_column.is_(None), id_column < last_id)
+        return or_(
+            sort_column < value,
+            and_(sort_column == value, id_column < last_id),
+            sort_column.is_(None),
+        )
+
+    if value is None:
+        return or_(
+            and_(sort_column.is_(None), id_column > last_id),
+            sort_column.isnot(None),
+        )
+    return or_(sort_column > value, and_(sort_column == value, id_column > last_id))
+
+
+def _ordered(query, sort_column, id_column, descending):
+    if descending:
+        return query.order_by(None).order_by(sort_column.desc(), id_column.desc())
+    return query.order_by(None).order_by(sort_column.asc(), id_column.asc())
+
+
+def get_cached_count(query, ttl=COUNT_CACHE_TTL):
+    """
+    `query.count()` memoised for `ttl` seconds per distinct filtered query.
+    """
+    compiled = query.statement.compile()
+    key = (str(compiled), repr(sorted(compiled.params.items())))
+
+    now = time.monotonic()
+    entry = _count_cache.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    total = query.order_by(None).count()
+
+    with _count_cache_lock:
+        if len(_count_cache) >= COUNT_CACHE_SIZE:
+            # Drop expired entries first, everything if that is not enough
+            for k in [k for k, v in _count_cache.items() if v[0] <= now]:
+                del _count_cache[k]
+            if len(_count_cache) >= COUNT_CACHE_SIZE:
+                _count_cache.clear()
+        _count_cache[key] = (now + ttl, total)
+
+    return total
+
+
+def paginate_keyset(
+    query, sort_column, id_column, descending, limit, cursor=None, with_total=False
+):
+    """
+    Fetch one page of `query` ordered by (`sort_column`, `id_column`).
+
+    Unlike OFFSET paging, every page costs the same: the cursor carries the
+    last seen sort value and id, and the next page starts right after them.
+
+    Parameters
+    ----------
+    query : sqlalchemy.orm.Query
+        The filtered query, any ORDER BY is replaced.
+    sort_column, id_column : Column
+        The sort column and the unique tie breaker.
+    descending : bool
+        Sort direction.
+    limit : int
+        Page size.
+    cursor : str, optional
+        `next_cursor` or `prev_cursor` of a previous page. None for the first page.
+    with_total : bool
+        Include the total number of results, cached for `COUNT_CACHE_TTL` seconds.
+
+    Returns
+    -------
+    dict
+        `results`, `next_cursor`, `prev_cursor` (None at either end) and
+        `total_results` (None unless requested).
+    """
+    limit = max(1, limit)
+    sort_key = sort_column.key
+
+    direction = "next"
+    page_query = query
+    if cursor:
+        direction, value, last_id = decode_cursor(cursor, sort_key, descending)
+        # Walking backwards is walking forwards in the reversed order
+        page_descending = descending if direction == "next" else not descending
+        page_query = query.filter(
+            _after(sort_column, id_column, value, last_id, page_descending)
+        )
+    else:
+        page_descending = descending
+
+    rows = (
+        _ordered(page_query, sort_column, id_column, page_descending)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows.reverse()
+
+    def row_cursor(row, row_direction):
+        return encode_cursor(
+            sort_key,
+            descending,
+            row_direction,
+            getattr(row, sort_key),
+            getattr(row, id_column.key),
+        )
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if direction == "prev" or has_more:
+            next_cursor = row_cursor(rows[-1], "next")
+        if (direction == "next" and cursor) or (direction == "prev" and has_more):
+            prev_cursor = row_cursor(rows[0], "prev")
+
+    return {
+        "results": rows,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "total_results": get_cached_count(query) if with_total else None,
+    }
+
+
+# region List endpoints
+class ListParams:
+    """
+    Query parameters shared by the global list endpoints, use as
+    `params: ListParams = Depends()`.
+
+    Without `limit` or `cursor` the endpoint keeps returning every row as a
+    plain list; `fields` and `sort` still apply.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None,
+        sort: str = "id",
+        order: str = "desc",
+        with_total: bool = False,
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = fields
+        self.sort = sort
+        self.order = order
+        self.with_total = with_total
+
+    @property
+    def paginated(self):
+        return self.limit is not None or self.cursor is not None
+
+
+def get_field_names(model, fields):
+    """
+    Validate a comma separated `fields=` value against the columns of `model`.
+
+    Returns
+    -------
+    list of str
+        The requested column names, every column when `fields` is empty.
+    """
+    columns = [column.key for column in model.__table__.columns]
+    if not fields:
+        return columns
+
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid fields ({', '.join(unknown)})",
+        )
+    return names
+
+
+def get_list_page(
+    db, model, params, sort_fields, extra_columns=(), joins=(), to_item=None
+):
+    """
+    Run a list endpoint: column-limited SELECT, whitelisted sort and, when
+    requested, keyset pagination.
+
+    Parameters
+    ----------
+    db : Session
+    model : mapped class
+        The listed table, must have an `id` primary key.
+    params : ListParams
+    sort_fields : iterable of str
+        Columns of `model` the list may be sorted by (preferably indexed).
+    extra_columns : iterable of labeled columns, optional
+        Selected next to the model columns, e.g. a joined username.
+    joins : iterable of (target, onclause), optional
+        Outer joins needed by `extra_columns`.
+    to_item : callable, optional
+        `to_item(values, row)` builds one result item from the dict of
+        requested fields and the full row. Defaults to the dict itself.
+
+    Returns
+    -------
+    list or dict
+        The items when not paginated, else `paginate_keyset`'s dict with the
+        items under `results`.
+    """
+    names = get_field_names(model, params.fields)
+
+    sort_key = params.sort.lower()
+    if sort_key not in sort_fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid sort ({params.sort}). Must be one of {', '.join(sort_fields)}.",
+        )
+    sort_column = getattr(model, sort_key)
+    descending = params.order.lower() == "desc"
+
+    # The cursor needs the id and the sort value, even when not requested
+    selected = list(dict.fromkeys([*names, "id", sort_key]))
+    query = db.query(*[getattr(model, name) for name in selected], *extra_columns)
+    for target, onclause in joins:
+        query = query.outerjoin(target, onclause)
+
+    if params.paginated:
+        page = paginate_keyset(
+            query,
+            sort_column,
+            model.id,
+            descending,
+            min(params.limit or LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT),
+            params.cursor,
+            params.with_total,
+        )
+        rows = page["results"]
+    else:
+        page = None
+        rows = _ordered(query, sort_column, model.id, descending).all()
+
+    n = len(names)
+    items = [dict(zip(names, row[:n])) for row in rows]
+    if to_item is not None:
+        items = [to_item(values, row) for values, row in zip(items, rows)]
+
+    if page is None:
+        return items
+    page["results"] = items
+    return page
+
+
+# endregion
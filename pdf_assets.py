@@ -0,0 +1,148 @@
+import copy
+import threading
+from io import BytesIO
+from reportlab.lib.rl_accel import asciiBase85Decode
+from reportlab.lib.utils import ImageReader, _digester
+from reportlab.pdfbase import pdfdoc, pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+FONT_FILES = {
+    "MyPoppin": "res/fonts/Poppins-Regular.ttf",
+    "MyPoppin-Bold": "res/fonts/Poppins-SemiBold.ttf",
+    "MyPoppin-Italic": "res/fonts/Poppins-Italic.ttf",
+    "Reddit-Black": "res/fonts/RedditMono-Black.ttf",
+    "Reddit-Medium": "res/fonts/RedditMono-Medium.ttf",
+}
+TEMPLATE_IMAGE_PATHS = {
+    "Q": "res/PageTemplate_QUO.jpg",
+    "I": "res/PageTemplate_INV.jpg",
+}
+CAP_IMAGE_PATH = "res/CapTTD.webp"
+
+_lock = threading.Lock()
+_fonts_registered = False
+_images = {}
+_compiled_images = {}
+
+
+class CachedImage:
+    """
+    In-memory image source that can be handed to `canvas.drawImage`.
+
+    The file is read once. JPEGs are passed through to the PDF as-is, other
+    formats are decoded once and their pixel/alpha data kept for reuse, so no
+    document ever touches the disk or the decoder again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = f.read()
+
+        self.reader = ImageReader(BytesIO(self.data))
+        self.is_jpeg = getattr(self.reader._image, "format", None) == "JPEG"
+        if not self.is_jpeg:
+            self.reader.getRGBData()
+
+    def __str__(self):
+        # drawImage names non-ImageReader sources by str(), keep it stable
+        return self.path
+
+    def __getattr__(self, name):
+        return getattr(self.reader, name)
+
+    def jpeg_fh(self):
+        return BytesIO(self.data) if self.is_jpeg else None
+
+
+def register_fonts():
+    global _fonts_registered
+
+    if _fonts_registered:
+        return
+
+    with _lock:
+        if not _fonts_registered:
+            for font_name, font_path in FONT_FILES.items():
+                pdfmetrics.registerFont(TTFont(font_name, font_path))
+            _fonts_registered = True
+
+
+def get_image(path):
+    image = _images.get(path)
+    if image is None:
+        with _lock:
+            image = _images.get(path)
+            if image is None:
+                image = CachedImage(path)
+                _images[path] = image
+    return image
+
+
+def get_template_path(doc_type):
+    return TEMPLATE_IMAGE_PATHS.get(doc_type, TEMPLATE_IMAGE_PATHS["I"])
+
+
+def _strip_a85(xobj):
+    # The PDF is written as binary anyway, ASCII85 only inflates the stream
+    if xobj._filters and xobj._filters[0] == "ASCII85Decode":
+        xobj.streamContent = asciiBase85Decode(xobj.streamContent)
+        xobj._filters = tuple(xobj._filters[1:])
+
+
+def get_compiled_image(path, mask=None):
+    """
+    Return the image XObject for `path`, compiled once per process.
+
+    The XObject is named exactly like `canvas.drawImage` would name the
+    `CachedImage` source, so drawImage finds it already registered and only
+    emits the placement operator.
+    """
+    key = (path, str(mask))
+    xobj = _compiled_images.get(key)
+    if xobj is None:
+        image = get_image(path)
+        with _lock:
+            xobj = _compiled_images.get(key)
+            if xobj is None:
+                xobj = pdfdoc.PDFImageXObject(
+                    _digester(f"{image}{mask}"), image, mask=mask
+                )
+                _strip_a85(xobj)
+                smask = getattr(xobj, "_smask", None)
+                if smask:
+                    _strip_a85(smask)
+                _compiled_images[key] = xobj
+    return xobj
+
+
+def draw_compiled_image(p, path, x, y, width, height, mask=None, **kwargs):
+    xobj = get_compiled_image(path, mask)
+    doc = p._doc
+    reg_name = doc.getXObjectName(xobj.name)
+
+    if reg_name not in doc.idToObject:
+        # Per-document shallow copy: stream bytes are shared, references are not
+        img_obj = copy.copy(xobj)
+        p._setXObjects(img_obj)
+        doc.Reference(img_obj, reg_name)
+        doc.addForm(xobj.name, img_obj)
+
+        smask = getattr(img_obj, "_smask", None)
+        if smask:
+            m_reg_name = doc.getXObjectName(smask.name)
+            if m_reg_name not in doc.idToObject:
+                img_obj.smask = doc.Reference(copy.copy(smask), m_reg_name)
+            else:
+                img_obj.smask = pdfdoc.PDFObjectReference(m_reg_name)
+            del img_obj._smask
+
+    return p.drawImage(get_image(path), x, y, width, height, mask=mask, **kwargs)
+
+
+def load_assets():
+    """Parse every font and image used by the PDF modules. Call at startup."""
+    register_fonts()
+    for path in TEMPLATE_IMAGE_PATHS.values():
+        get_compiled_image(path)
+    get_compiled_image(CAP_IMAGE_PATH, mask="auto")
@@ -2,12 +2,14 @@ from io import BytesIO
 from datetime import datetime
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from pdf_assets import (
+    register_fonts,
+    draw_compiled_image,
+    get_template_path,
+    CAP_IMAGE_PATH,
+)
 
 doc_type_mapping = {"Q": "QUO", "I": "INV"}
-CAP_IMAGE_PATH = "res/CapTTD.webp"
 NORMAL_FONT = "MyPoppin"
 BOLD_FONT = "MyPoppin-Bold"
 ITALIC_FONT = "MyPoppin-Italic"
@@ -18,9 +20,7 @@ ITALIC_FONT = "MyPoppin-Italic"
 
 
 def generate_pdf(invoice_data):
-    pdfmetrics.registerFont(TTFont("MyPoppin", "res/fonts/Poppins-Regular.ttf"))
-    pdfmetrics.registerFont(TTFont("MyPoppin-Bold", "res/fonts/Poppins-SemiBold.ttf"))
-    pdfmetrics.registerFont(TTFont("MyPoppin-Italic", "res/fonts/Poppins-Italic.ttf"))
+    register_fonts()
 
     table_header = ["Keterangan", "Harga(Rp)", "Qty", "Jml(Rp)"]
     col_widths = [350, 70, 30, 75]
@@ -32,15 +32,16 @@ def generate_pdf(invoice_data):
     p = canvas.Canvas(pdf_buffer, pagesize=A4)
 
     # Add Background Image
-    background_image_path = (
-        "res/PageTemplate_QUO.jpg"
-        if invoice_data["doc_type"] == "Q"
-        else "res/PageTemplate_INV.jpg"
+    draw_compiled_image(
+        p,
+        get_template_path(invoice_data["doc_type"]),
+        0,
+        0,
+        A4[0],
+        A4[1],
+        preserveAspectRatio=True,
     )
 
-    img = ImageReader(background_image_path)
-    p.drawImage(img, 0, 0, width=A4[0], height=A4[1], preserveAspectRatio=True)
-
     # Populate Header
     p.setFont(NORMAL_FONT, 10)
     p.setFillColorRGB(0.20784313725490197, 0.1843137254901961, 0.21176470588235294)
@@ -189,7 +190,8 @@ def generate_pdf(invoice_data):
         f"HERCULEX INDONESIA",
     )
 
-    p.drawImage(
+    draw_compiled_image(
+        p,
         CAP_IMAGE_PATH,
         ttd_base_x + 30,
         ttd_base_y - (row_height * 4),
@@ -1,13 +1,20 @@
+import os
 import time
 import random
 import string
 import datetime
+import threading
+import multiprocessing
 from io import BytesIO
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from pdf417 import encode, render_image
+from PIL import Image
+from pdf417 import encode
+from reportlab.lib.utils import ImageReader
+from pdf_assets import register_fonts
+from pdf_stream import StreamingCanvas
 
 doc_type_mapping = {"Q": "QUO", "I": "INV"}
 CAP_IMAGE_PATH = "res/CapTTD.png"
@@ -15,6 +22,32 @@ NORMAL_FONT = "Reddit-Medium"
 BOLD_FONT = "Reddit-Black"
 ITALIC_FONT = "MyPoppin-Italic"
 
+# 0/1 renders serially; batches smaller than PARALLEL_MIN_ORDERS always do.
+# Only used when rendering in the server process (streamed batch prints): jobs
+# on the render executor pass workers=0, its pool already spreads the load
+RENDER_WORKERS = int(
+    os.environ.get("HCX_ORDERANKU_RENDER_WORKERS", os.cpu_count() or 1)
+)
+PARALLEL_MIN_ORDERS = 16
+
+# Barcode module bits to grayscale pixels: "1" is a black bar
+_MODULE_TO_PIXEL = bytes.maketrans(b"01", b"\xff\x00")
+# White modules kept around the symbol so scanners find its edges
+QUIET_ZONE_MODULES = 2
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# Rendered barcodes keyed by the padded payload, least recently used first
+BARCODE_CACHE_SIZE = int(os.environ.get("HCX_BARCODE_CACHE_SIZE", 2048))
+
+_barcode_cache = OrderedDict()
+_barcode_cache_lock = threading.Lock()
+
+# Orders laid out between two flushes of a streamed document
+STREAM_CHUNK_ORDERS = 50
+
 
 def format_number_with_commas(number):
     """
@@ -244,7 +277,246 @@ def generate_id_header(order_id=5001):
     return oid_str
 
 
-def generate_orderanku(data_arr):
+def get_render_pool(workers):
+    global _pool, _pool_workers
+
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: forking the server process would copy its threads' locks
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def get_barcode_text(data):
+    return f"{data['orderanku_id']}~^~{data['receipent_name']}~^~{data['receipent_telp']}~^~{data['receipent_addr']}~^~{data['sender_name']}~^~{data['sender_telp']}"
+
+
+def get_barcode_seed(data):
+    return f"orderanku-{data['orderanku_id']}"
+
+
+def create_pdf417_barcodes(data_arr, workers=None):
+    """
+    Create the PDF417 barcode image of every order, in order.
+
+    Parameters
+    ----------
+    data_arr : list of dict
+        Order details, see `generate_orderanku`.
+    workers : int, optional
+        Size of the process pool used to encode and render the barcodes.
+        Defaults to RENDER_WORKERS; 0 or 1 renders in the calling process.
+        Pass 0 when already running in a worker process (render executor
+        jobs), otherwise every worker starts a pool of its own.
+
+    Returns
+    -------
+    list of PIL.Image.Image
+        One barcode image per order, in the same order as `data_arr`.
+
+    Notes
+    -----
+    Padding is seeded from the order id, so reprints hit the barcode cache and
+    only the orders not rendered before are encoded (or sent to the pool).
+    """
+    workers = RENDER_WORKERS if workers is None else workers
+    payloads = [
+        pad_barcode_text(get_barcode_text(data), seed=get_barcode_seed(data))
+        for data in data_arr
+    ]
+
+    images = {}
+    for payload in payloads:
+        if payload not in images:
+            images[payload] = get_cached_barcode(payload)
+    misses = [payload for payload, image in images.items() if image is None]
+
+    if workers <= 1 or len(misses) < PARALLEL_MIN_ORDERS:
+        for payload in misses:
+            images[payload] = render_barcode_payload(payload)
+    else:
+        chunksize = max(1, len(misses) // (workers * 4))
+        pool = get_render_pool(workers)
+        for payload, image in zip(
+            misses, pool.map(render_barcode_payload, misses, chunksize=chunksize)
+        ):
+            put_cached_barcode(payload, image)
+            images[payload] = image
+
+    return [images[payload] for payload in payloads]
+
+
+def draw_orderanku(p, data, barcode_image, curr_caret_y):
+    """
+    Draw the resi table of a single order below the caret.
+
+    Parameters:
+    -----------
+    p : canvas.Canvas or pdf_stream.StreamingCanvas
+        The canvas to draw on. A new page is started when the table does not
+        fit below the caret.
+    data : dict
+        Order details, see `generate_orderanku`.
+    barcode_image : PIL.Image.Image
+        The order barcode, see `create_pdf417_barcodes`.
+    curr_caret_y : float
+        Top of the free area on the current page.
+
+    Returns:
+    --------
+    float: The caret below the drawn table.
+    """
+    UNIT = 12
+    HORI_PADDING = 6 * UNIT
+    A4_width, A4_height = A4
+    MID_X = A4_width / 2
+    BARCODE_W = 100 / 2.75
+    BARCODE_H = 350 / 2.75
+    MIN_ROWS = 9
+    TEXT_LEV = 3.3
+
+    # region Definitions
+
+    data_map, data_row_count = process_invoice_item_rows(data, min_rows=MIN_ROWS)
+    area_rows = data_row_count + 3  # top-padding, header, spacing
+
+    if curr_caret_y - (area_rows * UNIT) <= 0:
+        p.showPage()
+        curr_caret_y = A4_height
+
+    table_top_y = curr_caret_y - UNIT
+    table_bot_y = table_top_y - ((data_row_count + 2) * UNIT)
+
+    left_top = (HORI_PADDING, table_top_y)
+    left_bot = (HORI_PADDING, table_bot_y)
+    right_top = (A4_width - HORI_PADDING, table_top_y)
+    right_bot = (A4_width - HORI_PADDING, table_bot_y)
+    mid_top = (MID_X, table_top_y)
+    mid_bot = (MID_X, table_bot_y)
+
+    p.setFont(NORMAL_FONT, 8)
+    p.setFillColorRGB(0, 0, 0)
+    p.setStrokeColorRGB(0.25, 0.25, 0.25)
+    # endregion
+
+    # region Create Table
+    # Vertical Lines
+    p.line(*mid_top, *mid_bot)
+    p.line(*left_top, *left_bot)
+    p.line(*right_top, *right_bot)
+
+    # Horizontal Lines
+    p.line(*left_top, *right_top)
+    p.line(*left_bot, *right_bot)
+
+    # Subheader
+    sub_x1 = MID_X - 5
+    sub_x2 = right_top[0] - 5
+    sub_y = table_top_y - UNIT + TEXT_LEV
+
+    lunas_str = "LUNAS" if data["paid_flag"] else "BELUM LUNAS"
+    oid_str = generate_id_header(data["orderanku_id"])
+    date_str = (
+        data["invoice_date"][:10]
+        if data["invoice_date"]
+        else datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    )
+
+    subheader_text = f"{lunas_str} (ORDER {oid_str}) {date_str}"
+
+    p.drawRightString(sub_x1, sub_y, subheader_text)
+    p.drawRightString(sub_x2, sub_y, subheader_text)
+    # endregion
+
+    # region Helper Line
+    # for i in range(1, area_rows - 2):
+    #     row_y = table_top_y - ((2 + i) * UNIT)
+    #     p.line(left_top[0], row_y, right_top[0], row_y)
+    #     p.drawString(MID_X - 10, row_y + TEXT_LEV, f"{i}")
+    # endregion
+    # region Barcodes
+    # Both copies share one image XObject
+    barcode_image = ImageReader(barcode_image)
+
+    # Draw the barcode (Left)
+    barcode_x = left_top[0] + 2
+    barcode_y = left_top[1] - BARCODE_H - 2 - (((data_row_count - MIN_ROWS) / 2) * UNIT)
+
+    p.drawImage(barcode_image, barcode_x, barcode_y, width=BARCODE_W, height=BARCODE_H)
+
+    barcode_line_x_1 = barcode_x + BARCODE_W + 2
+    p.line(barcode_line_x_1, left_bot[1], barcode_line_x_1, left_top[1])
+
+    # Draw the barcode (Right)
+    barcode_x = mid_top[0] + 2
+
+    p.drawImage(barcode_image, barcode_x, barcode_y, width=BARCODE_W, height=BARCODE_H)
+    barcode_line_x_2 = barcode_x + BARCODE_W + 2
+    p.line(barcode_line_x_2, table_bot_y, barcode_line_x_2, table_top_y)
+    # endregion
+
+    # region Data
+    p.setFont(BOLD_FONT, 8)
+    dh_x_l = barcode_line_x_1 + 5
+    colon_x_l = dh_x_l + 37
+    base_text_y = left_top[1] - (2 * UNIT) + TEXT_LEV
+
+    p.drawString(dh_x_l, base_text_y - (data_map["r_name"]["iRow"] * UNIT), "Kepada")
+    p.drawString(dh_x_l, base_text_y - (data_map["r_telp"]["iRow"] * UNIT), "Telp")
+    p.drawString(dh_x_l, base_text_y - (data_map["r_addr"]["iRow"] * UNIT), "Alamat")
+    p.drawString(dh_x_l, base_text_y - (data_map["s_name"]["iRow"] * UNIT), "Pengirim")
+    p.drawString(dh_x_l, base_text_y - (data_map["s_telp"]["iRow"] * UNIT), "Telp")
+
+    p.drawString(colon_x_l, base_text_y - (data_map["r_name"]["iRow"] * UNIT), ":")
+    p.drawString(colon_x_l, base_text_y - (data_map["r_telp"]["iRow"] * UNIT), ":")
+    p.drawString(colon_x_l, base_text_y - (data_map["r_addr"]["iRow"] * UNIT), ":")
+    p.drawString(colon_x_l, base_text_y - (data_map["s_name"]["iRow"] * UNIT), ":")
+    p.drawString(colon_x_l, base_text_y - (data_map["s_telp"]["iRow"] * UNIT), ":")
+
+    p.setFont(NORMAL_FONT, 8)  # Max Length for data 37 char
+
+    left_row_data = ["r_name", "r_telp", "r_addr", "s_name", "s_telp"]
+
+    data_x = colon_x_l + 5
+
+    for key in left_row_data:
+        start_row = data_map[key]["iRow"]
+        for i, line in enumerate(data_map[key]["lines"]):
+            row = start_row + i
+            line = line if line else ""
+            p.drawString(data_x, base_text_y - (row * UNIT), line)
+
+    # p.drawString(
+    #     data_x, base_text_y - (MIN_ROWS * UNIT), "000010000200003000040000500006"
+    # )
+
+    dh_x_2 = barcode_line_x_2 + 5
+    colon_x_2 = dh_x_2 + 32
+
+    p.setFont(BOLD_FONT, 8)
+    p.drawString(dh_x_2, base_text_y - (1 * UNIT), "Total")
+    p.drawString(dh_x_2, base_text_y - (2 * UNIT), "Pesanan")
+    p.drawString(colon_x_2, base_text_y - (1 * UNIT), ":")
+    p.drawString(colon_x_2, base_text_y - (2 * UNIT), ":")
+
+    p.setFont(NORMAL_FONT, 8)
+    data_x = colon_x_2 + 5
+    p.drawString(data_x, base_text_y - (1 * UNIT), data_map["d_total"]["lines"][0])
+
+    for i, line in enumerate(data_map["d_detail"]["lines"]):
+        row = data_map["d_detail"]["iRow"] + i
+        p.drawString(dh_x_2, base_text_y - (row * UNIT), line)
+
+    # endregion
+    return curr_caret_y - area_rows * UNIT  # Move the Caret
+
+
+def generate_orderanku(data_arr, workers=None):
     """
     Generate a PDF document with order details and barcodes for a list of orders.
 
@@ -273,243 +545,206 @@ def generate_orderanku(data_arr):
             Total amount of the order.
         - order_detail: str
             Order details in a specific format.
+    workers : int, optional
+        Process pool size for barcode rendering, see `create_pdf417_barcodes`.
+        The page layout is identical whatever the worker count.
 
     Returns:
     --------
     pdf_buffer (BytesIO): A buffer containing the PDF data.
     """
-    UNIT = 12
-    HORI_PADDING = 6 * UNIT
-    A4_width, A4_height = A4
-    MID_X = A4_width / 2
-    BARCODE_W = 100 / 2.75
-    BARCODE_H = 350 / 2.75
-    MIN_ROWS = 9
-    TEXT_LEV = 3.3
+    register_fonts()
 
-    pdfmetrics.registerFont(TTFont("Reddit-Black", "res/fonts/RedditMono-Black.ttf"))
-    pdfmetrics.registerFont(TTFont("Reddit-Medium", "res/fonts/RedditMono-Medium.ttf"))
+    barcode_images = create_pdf417_barcodes(data_arr, workers)
 
     pdf_buffer = BytesIO()
     p = canvas.Canvas(pdf_buffer, pagesize=A4)
 
-    curr_caret_y = A4_height
-    for data in data_arr:
-        # region Definitions
-
-        data_map, data_row_count = process_invoice_item_rows(data, min_rows=MIN_ROWS)
-        area_rows = data_row_count + 3  # top-padding, header, spacing
-
-        if curr_caret_y - (area_rows * UNIT) <= 0:
-            p.showPage()
-            curr_caret_y = A4_height
-
-        table_top_y = curr_caret_y - UNIT
-        table_bot_y = table_top_y - ((data_row_count + 2) * UNIT)
-
-        left_top = (HORI_PADDING, table_top_y)
-        left_bot = (HORI_PADDING, table_bot_y)
-        right_top = (A4_width - HORI_PADDING, table_top_y)
-        right_bot = (A4_width - HORI_PADDING, table_bot_y)
-        mid_top = (MID_X, table_top_y)
-        mid_bot = (MID_X, table_bot_y)
-
-        p.setFont(NORMAL_FONT, 8)
-        p.setFillColorRGB(0, 0, 0)
-        p.setStrokeColorRGB(0.25, 0.25, 0.25)
-        # endregion
-
-        # region Create Table
-        # Vertical Lines
-        p.line(*mid_top, *mid_bot)
-        p.line(*left_top, *left_bot)
-        p.line(*right_top, *right_bot)
-
-        # Horizontal Lines
-        p.line(*left_top, *right_top)
-        p.line(*left_bot, *right_bot)
-
-        # Subheader
-        sub_x1 = MID_X - 5
-        sub_x2 = right_top[0] - 5
-        sub_y = table_top_y - UNIT + TEXT_LEV
-
-        lunas_str = "LUNAS" if data["paid_flag"] else "BELUM LUNAS"
-        oid_str = generate_id_header(data["orderanku_id"])
-        date_str = (
-            data["invoice_date"][:10]
-            if data["invoice_date"]
-            else datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        )
+    curr_caret_y = A4[1]
+    for data, barcode_image in zip(data_arr, barcode_images):
+        curr_caret_y = draw_orderanku(p, data, barcode_image, curr_caret_y)
 
-        subheader_text = f"{lunas_str} (ORDER {oid_str}) {date_str}"
-
-        p.drawRightString(sub_x1, sub_y, subheader_text)
-        p.drawRightString(sub_x2, sub_y, subheader_text)
-        # endregion
-
-        # region Helper Line
-        # for i in range(1, area_rows - 2):
-        #     row_y = table_top_y - ((2 + i) * UNIT)
-        #     p.line(left_top[0], row_y, right_top[0], row_y)
-        #     p.drawString(MID_X - 10, row_y + TEXT_LEV, f"{i}")
-        # endregion
-        # region Barcodes
-        # Generate the barcode image
-        text_encode = f"{data['orderanku_id']}~^~{data['receipent_name']}~^~{data['receipent_telp']}~^~{data['receipent_addr']}~^~{data['sender_name']}~^~{data['sender_telp']}"
-        barcode_image = create_pdf417_barcode(text_encode)
-
-        # Draw the barcode (Left)
-        barcode_x = left_top[0] + 2
-        barcode_y = (
-            left_top[1] - BARCODE_H - 2 - (((data_row_count - MIN_ROWS) / 2) * UNIT)
-        )
-
-        p.drawInlineImage(
-            barcode_image, barcode_x, barcode_y, width=BARCODE_W, height=BARCODE_H
-        )
+    p.save()
+    pdf_buffer.seek(0)
+    filename = f"{int(time.time())}.pdf"
 
-        barcode_line_x_1 = barcode_x + BARCODE_W + 2
-        p.line(barcode_line_x_1, left_bot[1], barcode_line_x_1, left_top[1])
+    return pdf_buffer
+    # with open(os.path.join(os.getcwd(), filename), "wb") as f:
+    #     f.write(pdf_buffer.getbuffer())
 
-        # Draw the barcode (Right)
-        barcode_x = mid_top[0] + 2
 
-        p.drawInlineImage(
-            barcode_image, barcode_x, barcode_y, width=BARCODE_W, height=BARCODE_H
-        )
-        barcode_line_x_2 = barcode_x + BARCODE_W + 2
-        p.line(barcode_line_x_2, table_bot_y, barcode_line_x_2, table_top_y)
-        # endregion
-
-        # region Data
-        p.setFont(BOLD_FONT, 8)
-        dh_x_l = barcode_line_x_1 + 5
-        colon_x_l = dh_x_l + 37
-        base_text_y = left_top[1] - (2 * UNIT) + TEXT_LEV
-
-        p.drawString(
-            dh_x_l, base_text_y - (data_map["r_name"]["iRow"] * UNIT), "Kepada"
-        )
-        p.drawString(dh_x_l, base_text_y - (data_map["r_telp"]["iRow"] * UNIT), "Telp")
-        p.drawString(
-            dh_x_l, base_text_y - (data_map["r_addr"]["iRow"] * UNIT), "Alamat"
-        )
-        p.drawString(
-            dh_x_l, base_text_y - (data_map["s_name"]["iRow"] * UNIT), "Pengirim"
-        )
-        p.drawString(dh_x_l, base_text_y - (data_map["s_telp"]["iRow"] * UNIT), "Telp")
+def iter_orderanku(data_arr, workers=None, chunk_size=None):
+    """
+    Generate the same document as `generate_orderanku`, page by page.
 
-        p.drawString(colon_x_l, base_text_y - (data_map["r_name"]["iRow"] * UNIT), ":")
-        p.drawString(colon_x_l, base_text_y - (data_map["r_telp"]["iRow"] * UNIT), ":")
-        p.drawString(colon_x_l, base_text_y - (data_map["r_addr"]["iRow"] * UNIT), ":")
-        p.drawString(colon_x_l, base_text_y - (data_map["s_name"]["iRow"] * UNIT), ":")
-        p.drawString(colon_x_l, base_text_y - (data_map["s_telp"]["iRow"] * UNIT), ":")
+    Barcodes are rendered `chunk_size` orders at a time and every finished page
+    is yielded as soon as the chunk is laid out, so memory stays bounded by the
+    chunk rather than by the batch.
 
-        p.setFont(NORMAL_FONT, 8)  # Max Length for data 37 char
+    Parameters:
+    -----------
+    data_arr : list of dict
+        Order details, see `generate_orderanku`.
+    workers : int, optional
+        Process pool size for barcode rendering, see `create_pdf417_barcodes`.
+    chunk_size : int, optional
+        Orders per barcode batch. Defaults to `STREAM_CHUNK_ORDERS`.
 
-        left_row_data = ["r_name", "r_telp", "r_addr", "s_name", "s_telp"]
+    Yields:
+    -------
+    bytes: Consecutive parts of the PDF file.
+    """
+    chunk_size = chunk_size or STREAM_CHUNK_ORDERS
 
-        data_x = colon_x_l + 5
+    register_fonts()
 
-        for key in left_row_data:
-            start_row = data_map[key]["iRow"]
-            for i, line in enumerate(data_map[key]["lines"]):
-                row = start_row + i
-                line = line if line else ""
-                p.drawString(data_x, base_text_y - (row * UNIT), line)
+    p = StreamingCanvas(pagesize=A4)
 
-        # p.drawString(
-        #     data_x, base_text_y - (MIN_ROWS * UNIT), "000010000200003000040000500006"
-        # )
+    curr_caret_y = A4[1]
+    for start in range(0, len(data_arr), chunk_size):
+        chunk = data_arr[start : start + chunk_size]
+        for data, barcode_image in zip(chunk, create_pdf417_barcodes(chunk, workers)):
+            curr_caret_y = draw_orderanku(p, data, barcode_image, curr_caret_y)
 
-        dh_x_2 = barcode_line_x_2 + 5
-        colon_x_2 = dh_x_2 + 32
+        pdf_part = p.drain()
+        if pdf_part:
+            yield pdf_part
 
-        p.setFont(BOLD_FONT, 8)
-        p.drawString(dh_x_2, base_text_y - (1 * UNIT), "Total")
-        p.drawString(dh_x_2, base_text_y - (2 * UNIT), "Pesanan")
-        p.drawString(colon_x_2, base_text_y - (1 * UNIT), ":")
-        p.drawString(colon_x_2, base_text_y - (2 * UNIT), ":")
+    p.save()
+    yield p.drain()
 
-        p.setFont(NORMAL_FONT, 8)
-        data_x = colon_x_2 + 5
-        p.drawString(data_x, base_text_y - (1 * UNIT), data_map["d_total"]["lines"][0])
 
-        for i, line in enumerate(data_map["d_detail"]["lines"]):
-            row = data_map["d_detail"]["iRow"] + i
-            p.drawString(dh_x_2, base_text_y - (row * UNIT), line)
+def pad_barcode_text(data_str, max_len=790, min_len=300, seed=None):
+    """
+    Truncate or pad the barcode payload to the fixed length range.
 
-        # endregion
-        curr_caret_y -= area_rows * UNIT  # Move the Caret
+    If the length of the data string exceeds `max_len` characters, it is truncated.
+    If it is shorter than `min_len` characters, the "~EOF~" token followed by
+    random lowercase letters is appended so every resi barcode has a similar size.
+    With a `seed` the letters are the same on every call, which makes the barcode
+    of an order reproducible.
+    """
+    rng = random.Random(seed) if seed is not None else random
 
-    p.save()
-    pdf_buffer.seek(0)
-    filename = f"{int(time.time())}.pdf"
+    # Truncate data_str to the first 790 characters if necessary
+    if len(data_str) > max_len:
+        data_str = data_str[:max_len]
+    # Ensure data_str is at least MIN_LEN characters long
+    if len(data_str) < min_len:
+        remaining_length = min_len - len(data_str)
+        random_alphabets = "".join(
+            rng.choice(string.ascii_lowercase) for _ in range(remaining_length)
+        )
+        data_str += "~EOF~" + random_alphabets
 
-    return pdf_buffer
-    # with open(os.path.join(os.getcwd(), filename), "wb") as f:
-    #     f.write(pdf_buffer.getbuffer())
+    return data_str
 
 
-def create_pdf417_barcode(data_str):
+def render_pdf417_codes(codes, padding=QUIET_ZONE_MODULES):
     """
-    Create a PDF417 barcode image from the provided data string.
+    Rasterise PDF417 codewords at one pixel per module, rotated 90 degrees clockwise.
 
     Parameters
     ----------
-    data_str : str
-        The data string to be encoded in the barcode.
+    codes : list of list of int
+        Codeword rows as returned by `pdf417.encode`.
+    padding : int, optional
+        White quiet zone around the symbol, in modules (default 2). The
+        previous `render_image(scale=10, padding=2)` only left 2 pixels, a
+        fifth of a module.
 
     Returns
     -------
     PIL.Image.Image
-        A PIL Image object representing the generated PDF417 barcode.
+        A grayscale image `len(codes) + 2 * padding` pixels wide and one pixel
+        per module (plus the quiet zone) high.
 
     Notes
     -----
-    This function generates a PDF417 barcode image from the provided data string.
-    The barcode image is initially rendered with a scale of 10 and a ratio of 1.
-    If the length of the data string exceeds 790 characters, it is truncated.
-    If the length of the data string is less than 300 characters, it is padded with random alphabets
-    followed by the "~EOF~" token to ensure a minimum length of 300 characters.
-    The final barcode image is resized to fit the target dimensions of 350x100 pixels
-    and rotated 90 degrees clockwise.
-
+    The module matrix is written straight into its final orientation, so no
+    upscaled, resized or rotated intermediate images are created. Scaling to the
+    label size is left to the PDF (`drawImage` width/height), which keeps the
+    bars sharp at any print resolution.
+
+    The image is 8-bit grayscale ("L") rather than 1-bit: reportlab embeds "L"
+    images as DeviceGray but converts mode "1" to RGB, which would triple the
+    image data in the PDF. Pixels are only ever 0 or 255.
+    """
+    # One "0"/"1" string per barcode row, 17 modules per codeword (+1 stop bar)
+    rows = ["".join(format(value, "b") for value in row) for row in codes]
+    num_rows = len(rows)
+    num_cols = len(rows[0])
+    width = num_rows + 2 * padding
+    height = num_cols + 2 * padding
+
+    # Clockwise rotation: output row `col` reads the barcode rows bottom to top
+    pixels = bytearray(b"\xff" * (width * height))
+    for x, row in enumerate(reversed(rows)):
+        start = padding * width + padding + x
+        pixels[start : start + num_cols * width : width] = row.encode(
+            "ascii"
+        ).translate(_MODULE_TO_PIXEL)
+
+    return Image.frombytes("L", (width, height), bytes(pixels))
+
+
+def get_cached_barcode(payload):
+    with _barcode_cache_lock:
+        entry = _barcode_cache.get(payload)
+        if entry is None:
+            return None
+        _barcode_cache.move_to_end(payload)
+        return entry[1]
+
+
+def put_cached_barcode(payload, image, codes=None):
+    with _barcode_cache_lock:
+        _barcode_cache[payload] = (codes, image)
+        _barcode_cache.move_to_end(payload)
+        while len(_barcode_cache) > BARCODE_CACHE_SIZE:
+            _barcode_cache.popitem(last=False)
+
+
+def render_barcode_payload(payload):
     """
-    # Hardcoded dimensions for the output image
-    target_width = 350
-    target_height = 100
-    MAX_LEN = 790
-    MIN_LEN = 300
+    Encode and rasterise an already padded payload, through the barcode cache.
 
-    # Truncate data_str to the first 790 characters if necessary
-    if len(data_str) > MAX_LEN:
-        data_str = data_str[:MAX_LEN]
-    # Ensure data_str is at least 6 characters long
-    if len(data_str) < MIN_LEN:
-        remaining_length = MIN_LEN - len(data_str)
-        random_alphabets = "".join(
-            random.choice(string.ascii_lowercase) for _ in range(remaining_length)
-        )
-        data_str += "~EOF~" + random_alphabets
+    Cached images are shared between callers and must not be modified.
+    """
+    image = get_cached_barcode(payload)
+    if image is None:
+        codes = encode(payload)
+        image = render_pdf417_codes(codes)
+        put_cached_barcode(payload, image, codes)
+    return image
 
-    # Encode the data
-    codes = encode(data_str)
 
-    # Render the barcode image with an initial scale
-    image = render_image(codes, scale=10, ratio=1, padding=2)
+def create_pdf417_barcode(data_str, seed=None):
+    """
+    Create a PDF417 barcode image from the provided data string.
 
-    # Resize the image to fit the target dimensions
-    resized_image = image.resize((target_width, target_height))
+    Parameters
+    ----------
+    data_str : str
+        The data string to be encoded in the barcode.
+    seed : str or int, optional
+        Seed for the padding letters, see `pad_barcode_text`. Without it the
+        padding is random, so the cache practically never hits.
 
-    # Rotate the image 90 degrees clockwise
-    rotated_image = resized_image.rotate(-90, expand=True)
+    Returns
+    -------
+    PIL.Image.Image
+        A PIL Image object representing the generated PDF417 barcode.
 
-    # Save the final image
-    # rotated_image.save(f"{int(time.time())}_{len(data_str)}.jpg")
+    Notes
+    -----
+    The data string is truncated/padded by `pad_barcode_text`, encoded, and
+    rasterised at module resolution already rotated 90 degrees clockwise by
+    `render_pdf417_codes`. The caller stretches it into the label box.
+    Results are kept in a bounded LRU cache keyed by the padded payload.
 
-    return rotated_image
+    """
+    return render_barcode_payload(pad_barcode_text(data_str, seed=seed))
 
 
 def generate_dummy_order_long():
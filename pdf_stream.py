@@ -0,0 +1,240 @@
+import zlib
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.rl_accel import escapePDF, fp_str
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import (
+    FF_NONSYMBOLIC,
+    FF_SYMBOLIC,
+    SUBSETN,
+    makeToUnicodeCMap,
+)
+
+_CATALOG_NUM = 1
+_PAGES_NUM = 2
+_COLOR_SPACES = {"L": "DeviceGray", "RGB": "DeviceRGB", "CMYK": "DeviceCMYK"}
+
+
+class StreamingCanvas:
+    """
+    Canvas that writes every page to its output as soon as the page is finished.
+
+    Implements the part of the ReportLab `Canvas` API used by the resi layout
+    (setFont, setFillColorRGB, setStrokeColorRGB, line, drawString,
+    drawRightString, drawImage, showPage, save). Finished pages are collected
+    by `drain()`; only the current page and the font subsets stay in memory.
+
+    Fonts must be registered TrueType fonts. Their subsets keep growing while
+    pages are written, so the font objects are reserved on first use and
+    written in `save()`.
+    """
+
+    def __init__(self, pagesize=A4):
+        self.pagesize = pagesize
+        self._out = []
+        self._offset = 0
+        self._offsets = {}
+        self._next_num = _PAGES_NUM + 1
+        self._page_nums = []
+
+        # (font name, subset index) -> font object number
+        self._subset_nums = {}
+        self._fonts = {}
+
+        self._font = None
+        self._font_size = 10
+        self._new_page()
+
+        self._write(b"%PDF-1.4\n%\x93\x8c\x8b\x9e\n")
+
+    # region Output
+    def _write(self, data):
+        self._out.append(data)
+        self._offset += len(data)
+
+    def _alloc(self):
+        num = self._next_num
+        self._next_num += 1
+        return num
+
+    def _write_object(self, num, body):
+        self._offsets[num] = self._offset
+        self._write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+
+    def _write_stream(self, num, entries, data, compress=True):
+        if compress:
+            data = zlib.compress(data)
+            entries += " /Filter /FlateDecode"
+        head = f"<< {entries} /Length {len(data)} >>\nstream\n".encode("latin-1")
+        self._write_object(num, head + data + b"\nendstream")
+
+    def drain(self):
+        """Return the bytes written since the last call."""
+        data = b"".join(self._out)
+        self._out = []
+        return data
+
+    # endregion
+
+    # region Drawing
+    def _new_page(self):
+        self._code = []
+        self._page_fonts = {}
+        self._page_images = {}
+
+    def setFont(self, psfontname, size):
+        self._font = pdfmetrics.getFont(psfontname)
+        self._font_size = size
+
+    def setFillColorRGB(self, r, g, b):
+        self._code.append(f"{fp_str(r, g, b)} rg")
+
+    def setStrokeColorRGB(self, r, g, b):
+        self._code.append(f"{fp_str(r, g, b)} RG")
+
+    def line(self, x1, y1, x2, y2):
+        self._code.append(f"{fp_str(x1, y1)} m {fp_str(x2, y2)} l S")
+
+    def _subset_name(self, font, subset):
+        key = (font.fontName, subset)
+        num = self._subset_nums.get(key)
+        if num is None:
+            num = self._subset_nums[key] = self._alloc()
+            self._fonts[font.fontName] = font
+
+        name = f"F{num}"
+        self._page_fonts[name] = num
+        return name
+
+    def drawString(self, x, y, text):
+        R = [f"BT {fp_str(x, y)} Td"]
+        for subset, chunk in self._font.splitString(text, self):
+            name = self._subset_name(self._font, subset)
+            R.append(f"/{name} {fp_str(self._font_size)} Tf ({escapePDF(chunk)}) Tj")
+        R.append("ET")
+        self._code.append(" ".join(R))
+
+    def drawRightString(self, x, y, text):
+        width = self._font.stringWidth(text, self._font_size)
+        self.drawString(x - width, y, text)
+
+    def drawImage(self, image, x, y, width=None, height=None):
+        if not isinstance(image, ImageReader):
+            image = ImageReader(image)
+
+        # Keyed by the reader itself so it is not collected while the page is open
+        entry = self._page_images.get(id(image))
+        if entry is None:
+            img_width, img_height = image.getSize()
+            data = image.getRGBData()
+            num = self._alloc()
+            self._write_stream(
+                num,
+                f"/Type /XObject /Subtype /Image /Width {img_width} "
+                f"/Height {img_height} /BitsPerComponent 8 "
+                f"/ColorSpace /{_COLOR_SPACES[image.mode]}",
+                data,
+            )
+            entry = self._page_images[id(image)] = (image, f"Im{num}", num)
+
+        width = image.getSize()[0] if width is None else width
+        height = image.getSize()[1] if height is None else height
+        self._code.append(f"q {fp_str(width, 0, 0, height, x, y)} cm /{entry[1]} Do Q")
+
+    def showPage(self):
+        content_num = self._alloc()
+        self._write_stream(content_num, "", "\n".join(self._code).encode("latin-1"))
+
+        fonts = " ".join(f"/{name} {num} 0 R" for name, num in self._page_fonts.items())
+        images = " ".join(
+            f"/{name} {num} 0 R" for _, name, num in self._page_images.values()
+        )
+
+        page_num = self._alloc()
+        self._write_object(
+            page_num,
+            (
+                f"<< /Type /Page /Parent {_PAGES_NUM} 0 R "
+                f"/MediaBox [0 0 {fp_str(*self.pagesize)}] /Contents {content_num} 0 R "
+                f"/Resources << /ProcSet [/PDF /Text /ImageB /ImageC] "
+                f"/Font << {fonts} >> /XObject << {images} >> >> >>"
+            ).encode("latin-1"),
+        )
+        self._page_nums.append(page_num)
+        self._new_page()
+
+    # endregion
+
+    def _write_fonts(self):
+        for (font_name, subset_index), num in self._subset_nums.items():
+            font = self._fonts[font_name]
+            face = font.face
+            subset = font.state[self].subsets[subset_index]
+            base_name = b"".join(
+                (SUBSETN(subset_index), b"+", face.name, face.subfontNameX)
+            ).decode("pdfdoc")
+
+            font_file_num = self._alloc()
+            font_file = face.makeSubset(subset)
+            self._write_stream(font_file_num, f"/Length1 {len(font_file)}", font_file)
+
+            descriptor_num = self._alloc()
+            self._write_object(
+                descriptor_num,
+                (
+                    f"<< /Type /FontDescriptor /FontName /{base_name} "
+                    f"/Flags {face.flags & ~FF_NONSYMBOLIC | FF_SYMBOLIC} "
+                    f"/FontBBox [{fp_str(*face.bbox)}] /ItalicAngle {fp_str(face.italicAngle)} "
+                    f"/Ascent {fp_str(face.ascent)} /Descent {fp_str(face.descent)} "
+                    f"/CapHeight {fp_str(face.capHeight)} /StemV {fp_str(face.stemV)} "
+                    f"/MissingWidth {fp_str(face.defaultWidth)} "
+                    f"/FontFile2 {font_file_num} 0 R >>"
+                ).encode("latin-1"),
+            )
+
+            cmap_num = self._alloc()
+            self._write_stream(
+                cmap_num, "", makeToUnicodeCMap(base_name, subset).encode("latin-1")
+            )
+
+            widths = " ".join(fp_str(face.getCharWidth(code)) for code in subset)
+            self._write_object(
+                num,
+                (
+                    f"<< /Type /Font /Subtype /TrueType /BaseFont /{base_name} "
+                    f"/FirstChar 0 /LastChar {len(subset) - 1} /Widths [{widths}] "
+                    f"/FontDescriptor {descriptor_num} 0 R /ToUnicode {cmap_num} 0 R >>"
+                ).encode("latin-1"),
+            )
+
+        for font in self._fonts.values():
+            font.state.pop(self, None)
+
+    def save(self):
+        """Finish the last page and write fonts, page tree, xref and trailer."""
+        if self._code or not self._page_nums:
+            self.showPage()
+
+        self._write_fonts()
+
+        kids = " ".join(f"{num} 0 R" for num in self._page_nums)
+        self._write_object(
+            _PAGES_NUM,
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_nums)} >>".encode(
+                "latin-1"
+            ),
+        )
+        self._write_object(
+            _CATALOG_NUM, f"<< /Type /Catalog /Pages {_PAGES_NUM} 0 R >>".encode()
+        )
+
+        size = self._next_num
+        xref_offset = self._offset
+        xref = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for num in range(1, size):
+            xref.append(f"{self._offsets[num]:010d} 00000 n \n")
+        self._write("".join(xref).encode("latin-1"))
+        self._write(
+            f"trailer\n<< /Size {size} /Root {_CATALOG_NUM} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n".encode("latin-1")
+        )
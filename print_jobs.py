@@ -0,0 +1,216 @@
+import os
+import glob
+import json
+import time
+import uuid
+import asyncio
+import contextlib
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from render_executor import get_render_executor, render_orderanku_file
+
+PRINT_JOB_DIR = os.environ.get("HCX_PRINT_JOB_DIR", "cache/print_jobs")
+# Finished jobs and their PDFs are kept this many seconds
+PRINT_JOB_TTL = int(os.environ.get("HCX_PRINT_JOB_TTL", 24 * 3600))
+PRINT_JOB_TIMEOUT = float(os.environ.get("HCX_PRINT_JOB_TIMEOUT", 30 * 60))
+# Jobs queued or rendering in this process, further submissions get 503
+PRINT_JOB_MAX_PENDING = int(os.environ.get("HCX_PRINT_JOB_MAX_PENDING", 8))
+PRINT_JOB_RETRY_AFTER = 30
+
+JOB_QUEUED = "queued"
+JOB_RENDERING = "rendering"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Strong references, the event loop only keeps weak ones to running tasks
+_tasks = set()
+
+
+def _job_path(job_id, ext):
+    return os.path.join(PRINT_JOB_DIR, f"{job_id}.{ext}")
+
+
+def _write_job(job):
+    # Status lives on disk so every server worker can answer polls/downloads
+    path = _job_path(job["job_id"], "json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, path)
+
+
+def _update_job(job, **fields):
+    job.update(fields, updated_at=time.time())
+    _write_job(job)
+
+
+def get_print_job(job_id):
+    """
+    Read the status of a print job.
+
+    Returns
+    -------
+    dict or None
+        None for unknown (or malformed) job ids.
+    """
+    try:
+        job_id = uuid.UUID(job_id).hex
+    except ValueError:
+        return None
+
+    return _read_job(_job_path(job_id, "json"))
+
+
+def _read_job(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def get_print_job_file(job_id):
+    return _job_path(uuid.UUID(job_id).hex, "pdf")
+
+
+async def submit_print_job(owner, data_arr, on_success=None):
+    """
+    Queue a resi batch render and return its job record at once.
+
+    Parameters
+    ----------
+    owner : str
+        JWT subject of the submitter, only they can read the job.
+    data_arr : list of dict
+        Order details, see `pdf_orderanku_module.generate_orderanku`.
+    on_success : callable, optional
+        Blocking callback run in the threadpool once the PDF is complete.
+        A failing callback fails the job.
+    """
+    pending = sum(1 for task in _tasks if not task.done())
+    if pending >= PRINT_JOB_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many print jobs queued, please retry later",
+            headers={"Retry-After": str(PRINT_JOB_RETRY_AFTER)},
+        )
+
+    job = await run_in_threadpool(_create_job, owner, len(data_arr))
+
+    task = asyncio.get_running_loop().create_task(_run_job(job, data_arr, on_success))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+    return job
+
+
+def _create_job(owner, order_count):
+    os.makedirs(PRINT_JOB_DIR, exist_ok=True)
+    _cleanup()
+
+    now = time.time()
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "owner": owner,
+        "status": JOB_QUEUED,
+        "order_count": order_count,
+        "size": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    _write_job(job)
+    return job
+
+
+def _render_job(data_arr, path, job_path):
+    # Runs in a render worker. A timed out job is failed while its worker
+    # keeps going: the output is then removed here, _fail_job may have tried
+    # before it existed
+    size = render_orderanku_file(data_arr, path)
+
+    job = _read_job(job_path)
+    if job is None or job["status"] == JOB_FAILED:
+        _remove_file(path)
+    return size
+
+
+async def render_print_job(owner, data_arr):
+    """
+    Render a resi batch as a print job and wait for it.
+
+    For batches too big to build in memory: a render worker writes the PDF to
+    `get_print_job_file(job_id)`, where it can be streamed from. Unlike
+    `submit_print_job` a busy renderer is not waited for.
+
+    Raises
+    ------
+    HTTPException
+        503 / 504 from `RenderExecutor.run`, the job is then failed.
+    """
+    job = await run_in_threadpool(_create_job, owner, len(data_arr))
+
+    try:
+        size = await _render(job, data_arr)
+        await run_in_threadpool(_update_job, job, status=JOB_DONE, size=size)
+    except Exception as e:
+        await _fail_job(job, e)
+        raise
+    return job
+
+
+async def _render(job, data_arr, timeout=None):
+    await run_in_threadpool(_update_job, job, status=JOB_RENDERING)
+    return await get_render_executor().run(
+        _render_job,
+        data_arr,
+        _job_path(job["job_id"], "pdf"),
+        _job_path(job["job_id"], "json"),
+        timeout=timeout,
+    )
+
+
+async def _run_job(job, data_arr, on_success):
+    executor = get_render_executor()
+
+    try:
+        while True:
+            try:
+                size = await _render(job, data_arr, PRINT_JOB_TIMEOUT)
+                break
+            except HTTPException as e:
+                if e.status_code != status.HTTP_503_SERVICE_UNAVAILABLE:
+                    raise
+                # Interactive renders have the pool, wait for a free slot
+                await run_in_threadpool(_update_job, job, status=JOB_QUEUED)
+                await asyncio.sleep(executor.retry_after)
+
+        if on_success is not None:
+            await run_in_threadpool(on_success)
+
+        await run_in_threadpool(_update_job, job, status=JOB_DONE, size=size)
+    except Exception as e:
+        await _fail_job(job, e)
+
+
+async def _fail_job(job, e):
+    detail = e.detail if isinstance(e, HTTPException) else repr(e)
+    # Failed first, so a worker finishing later removes its own output
+    await run_in_threadpool(_update_job, job, status=JOB_FAILED, error=detail)
+    await run_in_threadpool(_remove_file, _job_path(job["job_id"], "pdf"))
+
+
+def _remove_file(path):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+def _cleanup():
+    expire_before = time.time() - PRINT_JOB_TTL
+    for path in glob.glob(os.path.join(PRINT_JOB_DIR, "*")):
+        try:
+            if os.stat(path).st_mtime < expire_before:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
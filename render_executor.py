@@ -0,0 +1,170 @@
+import os
+import asyncio
+import contextlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+
+from pdf_assets import load_assets
+from pdf_module import generate_pdf
+from pdf_orderanku_module import generate_orderanku, iter_orderanku
+
+RENDER_WORKERS = int(os.environ.get("HCX_RENDER_WORKERS", os.cpu_count() or 1))
+# Jobs running or waiting for a worker, further jobs are turned away with 503
+RENDER_QUEUE_DEPTH = int(os.environ.get("HCX_RENDER_QUEUE_DEPTH", RENDER_WORKERS * 4))
+RENDER_TIMEOUT = float(os.environ.get("HCX_RENDER_TIMEOUT", 60))
+RENDER_RETRY_AFTER = int(os.environ.get("HCX_RENDER_RETRY_AFTER", 5))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# region Jobs
+# Run inside the worker processes, arguments and results must be picklable.
+# Orderanku jobs render serially (workers=0): the executor already runs one
+# job per process, a nested barcode pool per job would multiply the processes
+def render_invoice_pdf(invoice_data):
+    pdf_buffer, _ = generate_pdf(invoice_data)
+    return pdf_buffer.getvalue()
+
+
+def render_orderanku_pdf(data_arr):
+    return generate_orderanku(data_arr, workers=0).getvalue()
+
+
+def render_orderanku_file(data_arr, path):
+    # Streamed straight to disk, so batch size does not bound worker memory
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            for pdf_part in iter_orderanku(data_arr, workers=0):
+                f.write(pdf_part)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # The temp file may not exist yet, keep the original error
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+    return os.path.getsize(path)
+
+
+# endregion
+
+
+class RenderExecutor:
+    """
+    Bounded process pool for CPU-bound document rendering.
+
+    `run` awaits the job without blocking the event loop or a threadpool
+    slot. At most `queue_depth` jobs are accepted at once; beyond that the
+    caller gets a 503 with Retry-After instead of queueing indefinitely.
+    """
+
+    def __init__(self, workers, queue_depth, timeout, retry_after):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.retry_after = retry_after
+
+        self._pool = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn: forking the server process would copy its threads' locks
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=load_assets,
+            )
+        return self._pool
+
+    def _unavailable(self, reason):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{reason}, please retry later",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.queue_depth:
+                raise self._unavailable("Document renderer is busy")
+            self._pending += 1
+
+    def _release(self, _=None):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args, timeout=None):
+        """
+        Run `fn(*args)` on the pool and return its result.
+
+        Raises
+        ------
+        HTTPException
+            503 when the queue is full or the pool broke down, 504 when the job
+            did not finish within `timeout` (default `self.timeout`) seconds.
+        """
+        self._acquire()
+        try:
+            with self._lock:
+                future = self._get_pool().submit(fn, *args)
+        except BrokenProcessPool:
+            self._release()
+            self.reset()
+            raise self._unavailable("Document renderer is restarting")
+        except BaseException:
+            self._release()
+            raise
+
+        # The slot is held until the worker is really done, even after a timeout
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout or self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Document rendering timed out",
+            )
+        except BrokenProcessPool:
+            self.reset()
+            raise self._unavailable("Document renderer is restarting")
+
+    def reset(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def get_render_executor():
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = RenderExecutor(
+                    RENDER_WORKERS,
+                    RENDER_QUEUE_DEPTH,
+                    RENDER_TIMEOUT,
+                    RENDER_RETRY_AFTER,
+                )
+    return _executor
+
+
+def shutdown_render_executor():
+    if _executor is not None:
+        _executor.shutdown()
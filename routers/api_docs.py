@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Header, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
 from fastapi_jwt_auth import AuthJWT
 from sqlalchemy import func, case
-from sqlalchemy.orm import Session, aliased
-from pdf_module import generate_pdf
+from sqlalchemy.orm import Session
+from render_executor import get_render_executor, render_invoice_pdf
+from json_response import FastJSONResponse
+from doc_cache import get_doc_hash, get_cached_doc, put_cached_doc, invalidate_doc
 from datetime import datetime
 
-from schemas import OrderDocument
+from schemas import OrderDocument, OrderIdListPayload
 
 from database import (
     get_db,
@@ -18,9 +21,11 @@ from database import (
 
 router = APIRouter(tags=["API Docs"], prefix="/api_docs")
 
+INQUIRY_MAX_ORDERS = 1000
+
 
 @router.post("/")
-def create_order_doc(
+async def create_order_doc(
     data: OrderDocument,
     Authorize: AuthJWT = Depends(),
     db: Session = Depends(get_db),
@@ -30,6 +35,17 @@ def create_order_doc(
     # Check if order_id is valid
     # check_if_order_exist(data.order_id, db)
 
+    # Blocking database work runs on the threadpool, not on the event loop
+    doc_id = await run_in_threadpool(save_order_doc, data, db)
+
+    # Get Invoice Data from DB
+    invoice_data = await run_in_threadpool(get_invoice_data_by_orderdocid, doc_id, db)
+
+    # Return the PDF
+    return await render_order_doc(doc_id, invoice_data)
+
+
+def save_order_doc(data: OrderDocument, db: Session):
     new_doc = OrderDocument_TM(
         order_id=data.order_id,
         doc_type=data.doc_type,
@@ -62,20 +78,11 @@ def create_order_doc(
         db.add(new_item)
     db.commit()
 
-    # Get Invoice Data from DB
-    invoice_data = get_invoice_data_by_orderdocid(new_doc.id, db)
-
-    # Return the PDF as a streaming response
-    pdf_buffer, filename = generate_pdf(invoice_data)
-    return StreamingResponse(
-        pdf_buffer,
-        media_type="application/pdf",
-        # headers={"Content-Disposition": f'attachment; filename="{filename}.pdf"'},
-    )
+    return new_doc.id
 
 
 @router.patch("/id/{doc_id}")
-def edit_order_doc(
+async def edit_order_doc(
     doc_id: int,
     data: OrderDocument,
     Authorize: AuthJWT = Depends(),
@@ -83,6 +90,18 @@ def edit_order_doc(
 ):
     # Authorize.jwt_required()
 
+    await run_in_threadpool(update_order_doc, doc_id, data, db)
+
+    # Get updated Invoice Data from DB
+    updated_invoice_data = await run_in_threadpool(
+        get_invoice_data_by_orderdocid, doc_id, db
+    )
+
+    # Return the PDF
+    return await render_order_doc(doc_id, updated_invoice_data)
+
+
+def update_order_doc(doc_id: int, data: OrderDocument, db: Session):
     # Check if doc_id exists
     existing_doc = get_order_doc_by_id(doc_id, db)
     if not existing_doc:
@@ -121,15 +140,28 @@ def edit_order_doc(
 
     db.commit()
 
-    # Get updated Invoice Data from DB
-    updated_invoice_data = get_invoice_data_by_orderdocid(doc_id, db)
+    # Drop renders of the previous version
+    invalidate_doc(doc_id)
+
+
+async def render_order_doc(doc_id, invoice_data, if_none_match=None):
+    doc_hash = get_doc_hash(invoice_data)
+    etag = f'"{doc_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    # Client already has this exact render
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    pdf_bytes = await run_in_threadpool(get_cached_doc, doc_id, doc_hash)
+    if pdf_bytes is None:
+        pdf_bytes = await get_render_executor().run(render_invoice_pdf, invoice_data)
+        await run_in_threadpool(put_cached_doc, doc_id, doc_hash, pdf_bytes)
 
-    # Return the PDF as a streaming response
-    pdf_buffer, filename = generate_pdf(updated_invoice_data)
-    return StreamingResponse(
-        pdf_buffer,
+    return Response(
+        content=pdf_bytes,
         media_type="application/pdf",
-        # headers={"Content-Disposition": f'attachment; filename="{filename}.pdf"'},
+        headers=headers,
     )
 
 
@@ -138,20 +170,18 @@ def get_order_doc_by_id(doc_id: int, db: Session):
 
 
 @router.get("/download/id/{id}")
-def download_order_doc_by_id(
-    id: str, Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)
+async def download_order_doc_by_id(
+    id: int,
+    if_none_match: str = Header(None),
+    Authorize: AuthJWT = Depends(),
+    db: Session = Depends(get_db),
 ):
 
     # Get Invoice Data from DB
-    invoice_data = get_invoice_data_by_orderdocid(id, db)
+    invoice_data = await run_in_threadpool(get_invoice_data_by_orderdocid, id, db)
 
-    # Return the PDF as a streaming response
-    pdf_buffer, filename = generate_pdf(invoice_data)
-    return StreamingResponse(
-        pdf_buffer,
-        media_type="application/pdf",
-        # headers={"Content-Disposition": f'attachment; filename="{filename}.pdf"'},
-    )
+    # Return the PDF
+    return await render_order_doc(id, invoice_data, if_none_match)
 
 
 @router.get("/id/{doc_id}")
@@ -180,20 +210,20 @@ def get_document_by_id(doc_id: int, db: Session = Depends(get_db)):
         "cust_phone": doc.cust_phone,
         "cust_fax": doc.cust_fax,
         "due_date": doc.due_date,
-        "discount": float(doc.discount),
-        "down_payment": float(doc.down_payment),
+        "discount": doc.discount,
+        "down_payment": doc.down_payment,
         "items": [
             {
                 "id": item.id,
                 "name": item.item_name,
-                "price": float(item.item_price),
+                "price": item.item_price,
                 "qty": item.item_qty,
             }
             for item in items
         ],
     }
 
-    return document_with_items
+    return FastJSONResponse(document_with_items)
 
 
 @router.get("/list/latest/{n}")
@@ -203,7 +233,30 @@ def get_latest_n_docs(
     # Authorize.jwt_required()
     res = db.query(OrderDocument_TM).order_by(OrderDocument_TM.id.desc()).limit(n).all()
 
-    return res
+    return FastJSONResponse(res)
+
+
+def get_latest_doc_ids(order_ids, db: Session):
+    # One pass over the (order_id, doc_type, id) index, no self-join. The index
+    # is created by migrations/001_orderdocument_order_type_id_index.sql
+    query = (
+        db.query(
+            OrderDocument_TM.order_id,
+            func.max(
+                case((OrderDocument_TM.doc_type == "I", OrderDocument_TM.id))
+            ).label("latest_invoice_id"),
+            func.max(
+                case((OrderDocument_TM.doc_type == "Q", OrderDocument_TM.id))
+            ).label("latest_quote_id"),
+        )
+        .filter(OrderDocument_TM.order_id.in_(order_ids))
+        .group_by(OrderDocument_TM.order_id)
+    )
+
+    return {
+        order_id: (latest_invoice_id, latest_quote_id)
+        for order_id, latest_invoice_id, latest_quote_id in query
+    }
 
 
 @router.get("/inquiry/order_id/{order_id}")
@@ -213,24 +266,11 @@ def inquiry_docs_by_order_id(
     # Authorize.jwt_required()
     check_if_order_exist(order_id, db)
 
-    a1 = aliased(OrderDocument_TM)
-    a2 = aliased(OrderDocument_TM)
-
-    query = (
-        db.query(
-            func.max(case((a1.doc_type == "I", a1.id), else_=None)).label(
-                "latest_invoice_id"
-            ),
-            func.max(case((a2.doc_type == "Q", a2.id), else_=None)).label(
-                "latest_quote_id"
-            ),
-        )
-        .filter(a1.order_id == order_id)
-        .filter(a2.order_id == order_id)
+    latest_doc_ids = get_latest_doc_ids([order_id], db)
+    latest_invoice_id, latest_quote_id = next(
+        iter(latest_doc_ids.values()), (None, None)
     )
 
-    latest_invoice_id, latest_quote_id = query.one()
-
     return {
         "order_id": order_id,
         "latest_invoice_id": latest_invoice_id,
@@ -238,6 +278,36 @@ def inquiry_docs_by_order_id(
     }
 
 
+@router.post("/inquiry/order_ids")
+def inquiry_docs_by_order_ids(
+    payload: OrderIdListPayload,
+    Authorize: AuthJWT = Depends(),
+    db: Session = Depends(get_db),
+):
+    # Authorize.jwt_required()
+    if len(payload.order_ids) > INQUIRY_MAX_ORDERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {INQUIRY_MAX_ORDERS} order ids per inquiry",
+        )
+
+    latest_doc_ids = get_latest_doc_ids(set(payload.order_ids), db)
+
+    # Same order as requested, orders without documents get nulls
+    result_list = []
+    for order_id in payload.order_ids:
+        latest_invoice_id, latest_quote_id = latest_doc_ids.get(order_id, (None, None))
+        result_list.append(
+            {
+                "order_id": order_id,
+                "latest_invoice_id": latest_invoice_id,
+                "latest_quote_id": latest_quote_id,
+            }
+        )
+
+    return result_list
+
+
 def get_invoice_data_by_orderdocid(id: str, db: Session):
     query = (
         db.query(OrderDocument_TM, OrderDocumentItem_TR)
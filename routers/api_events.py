@@ -0,0 +1,152 @@
+import asyncio
+from typing import Optional
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from fastapi_jwt_auth import AuthJWT
+from fastapi_jwt_auth.exceptions import AuthJWTException
+
+from event_bus import (
+    EVENT_KEEPALIVE_SECONDS,
+    TOPIC_ORDER,
+    TOPIC_ORDERANKU,
+    event_bus,
+    make_event_filter,
+)
+from json_response import dumps
+
+router = APIRouter(tags=["API Events"], prefix="/events")
+
+EVENT_TOPICS = {TOPIC_ORDER, TOPIC_ORDERANKU}
+
+
+def get_event_filter(topic, bucket, batchfile_id):
+    if topic not in EVENT_TOPICS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid topic ({topic}). Must be one of {', '.join(sorted(EVENT_TOPICS))}.",
+        )
+    return make_event_filter(topic, bucket, batchfile_id)
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    topic: str = TOPIC_ORDER,
+    bucket: Optional[str] = None,
+    batchfile_id: Optional[int] = None,
+    token: Optional[str] = None,
+    Authorize: AuthJWT = Depends(),
+):
+    """
+    Server-Sent Events feed of order board changes.
+
+    Each event is a JSON object: `topic`, `action`, `ids`, `ts` and for
+    orders `from_status`, `to_status`, `batchfile_id`. Filter with `bucket`
+    (see `/api_order/changes`) and/or `batchfile_id`. An `action` of
+    `resync` means events were dropped, or the server has too many
+    subscribers and ends the stream; catch up through `/api_order/changes`.
+    """
+    # EventSource cannot set headers, so the access token may be a query parameter
+    if token:
+        Authorize.jwt_required("websocket", token=token)
+    else:
+        Authorize.jwt_required()
+
+    matches = get_event_filter(topic, bucket, batchfile_id)
+
+    async def event_stream():
+        # Subscribed inside the stream, not before returning it: a client gone
+        # before the first iteration never runs this generator, nor its finally
+        subscription = None
+        try:
+            yield b"retry: 3000\n\n"
+            try:
+                subscription = event_bus.subscribe(matches)
+            except HTTPException:
+                # Too many subscribers. The response has started, so instead of
+                # a 503 the client is told to resync; it reconnects after retry
+                yield b"data: " + dumps({"topic": topic, "action": "resync"}) + b"\n\n"
+                return
+
+            while not await request.is_disconnected():
+                event = await subscription.get(EVENT_KEEPALIVE_SECONDS)
+                if event is None:
+                    # Keeps proxies from closing an idle connection
+                    yield b": keepalive\n\n"
+                else:
+                    yield b"data: " + dumps(event) + b"\n\n"
+        finally:
+            if subscription is not None:
+                subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def events_websocket(
+    websocket: WebSocket,
+    topic: str = TOPIC_ORDER,
+    bucket: Optional[str] = None,
+    batchfile_id: Optional[int] = None,
+    token: str = "",
+    Authorize: AuthJWT = Depends(),
+):
+    """WebSocket variant of `/events/stream`, same parameters and events."""
+    await websocket.accept()
+
+    try:
+        Authorize.jwt_required("websocket", token=token)
+        subscription = event_bus.subscribe(
+            get_event_filter(topic, bucket, batchfile_id)
+        )
+    except AuthJWTException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    except HTTPException as e:
+        await websocket.close(
+            code=(
+                status.WS_1013_TRY_AGAIN_LATER
+                if e.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+                else status.WS_1003_UNSUPPORTED_DATA
+            )
+        )
+        return
+
+    async def wait_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    # Clients send nothing, reading only watches for the close so the loop
+    # stops without waiting for the next keepalive send
+    disconnected = asyncio.ensure_future(wait_disconnect())
+    try:
+        while True:
+            next_event = asyncio.ensure_future(
+                subscription.get(EVENT_KEEPALIVE_SECONDS)
+            )
+            await asyncio.wait(
+                {next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected.done():
+                next_event.cancel()
+                break
+
+            event = next_event.result() or {"topic": topic, "action": "keepalive"}
+            await websocket.send_text(dumps(event).decode())
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        disconnected.cancel()
+        subscription.close()
@@ -1,12 +1,14 @@
+import os
 import random
 import string
 import requests as r
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi_jwt_auth import AuthJWT
 from sqlalchemy.orm import Session, aliased
-from sqlalchemy import or_
+from sqlalchemy import and_, or_, case
 from datetime import datetime, timedelta
 import time
+from collections import defaultdict
 
 from database import (
     get_db,
@@ -17,10 +19,14 @@ from database import (
     OrderComment_TH,
     OrderBatchfile_TM,
 )
+from unit_of_work import OrderUnitOfWork
+from json_response import FastJSONResponse, orm_to_dict
+from pagination import ListParams, get_list_page
 from schemas import (
     OrderUpdate,
     OrderSubmitURL,
     OrderUpdateDatePayload,
+    OrderBulkTransitionPayload,
     OrderInitialInputPayload,
     OrderPICUpdatePayload,
     OrderCommentCreatePayload,
@@ -33,6 +39,63 @@ from schemas import (
 
 router = APIRouter(tags=["API Order"], prefix="/api_order")
 
+# Every order_tm column, the list endpoints select them as plain values
+# instead of building ORM objects
+ORDER_LIST_COLUMNS = list(Order_TM.__table__.columns)
+ORDER_LIST_KEYS = tuple(column.key for column in ORDER_LIST_COLUMNS)
+
+# Orders counted as active by /get_all_active_orders
+ACTIVE_ECOM_STATUSES = [220, 221, 400, 450]
+
+# The delta feed re-sends changes this many seconds older than the client's
+# watermark, so rows committed late by a slow transaction are not missed
+ORDER_DELTA_OVERLAP_SECONDS = int(os.environ.get("HCX_ORDER_DELTA_OVERLAP_SECONDS", 10))
+# Bigger deltas make the client reload the snapshot instead
+ORDER_DELTA_MAX_ROWS = 2000
+# The delta scans need:
+#   ALTER TABLE order_tm
+#       ADD INDEX ix_last_updated_ts (last_updated_ts),
+#       ADD INDEX ix_feeding_dt (feeding_dt);
+
+# Sortable columns of the global order lists
+ORDER_SORT_FIELDS = ("id", "feeding_dt", "last_updated_ts", "pltf_deadline_dt")
+
+# Optional parts of GET /id/{id}
+ORDER_DETAIL_INCLUDES = {"trackings"}
+
+# Bulk workflow steps: required status, next status, date column set to the
+# payload date (or now), columns cleared and the tracking message
+ORDER_TRANSITIONS = {
+    "design_acc": {
+        "from": "200",
+        "to": "250",
+        "date_field": "design_acc_dt",
+        "clear": [],
+        "msg": "Approved Design",
+    },
+    "design_rej": {
+        "from": "200",
+        "to": "100",
+        "date_field": None,
+        "clear": ["design_sub_dt"],
+        "msg": "Rejected Design",
+    },
+    "print_done": {
+        "from": "300",
+        "to": "400",
+        "date_field": "print_done_dt",
+        "clear": [],
+        "msg": "Printing Process Done",
+    },
+    "packing_done": {
+        "from": "400",
+        "to": "999",
+        "date_field": "packing_done_dt",
+        "clear": [],
+        "msg": "Packing Process Done",
+    },
+}
+
 
 @router.post("/post_manual_order")
 def post_manual_order(
@@ -51,128 +114,224 @@ def post_manual_order(
     # Check given user_id
     user = check_if_user_exist(data.user_id, db)
 
-    # Create Order
-    new_order = Order_TM(
-        ecommerce_code=data.platform_code,
-        feeding_dt=datetime.now(),
-        ecom_order_status="MANUAL",
-        internal_status_id="000",
-    )
+    with OrderUnitOfWork(db) as uow:
+        # Create Order
+        new_order = uow.add(
+            Order_TM(
+                ecommerce_code=data.platform_code,
+                feeding_dt=uow.now,
+                last_updated_ts=uow.now,
+                ecom_order_status="MANUAL",
+                internal_status_id="000",
+            )
+        )
 
-    db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
+        # The flush assigns the id inside the same transaction
+        uow.flush()
 
-    # Get the id of the newly created Order
-    order_id = new_order.id
+        # Form ecom_order_id with the formula new_order.ecommerce_code + new_order.id (10 digits, zero pad)
+        ecom_order_id = f"{new_order.ecommerce_code}{new_order.id:010d}"
+        new_order.ecom_order_id = ecom_order_id
 
-    # Form ecom_order_id with the formula new_order.ecommerce_code + new_order.id (10 digits, zero pad)
-    ecom_order_id = f"{new_order.ecommerce_code}{order_id:010d}"
+        # Create OrderItem
+        uow.add(
+            OrderItem_TR(
+                ecom_order_id=ecom_order_id,
+                product_name=data.product_name,
+                quantity=data.quantity,
+                product_price=data.price,
+            )
+        )
 
-    # Update the new_order.ecom_order_id with the new formula
-    new_order.ecom_order_id = ecom_order_id
-    db.commit()
+        # Create Tracking
+        uow.track(new_order, "Created manual order to system", data.user_id)
+        uow.notify("created", [new_order.id], to_status="000")
 
-    # Create OrderItem
-    new_item = OrderItem_TR(
-        ecom_order_id=ecom_order_id,
-        product_name=data.product_name,
-        quantity=data.quantity,
-        product_price=data.price,
-    )
+    return {"msg": "Manual order successfully saved!"}
 
-    db.add(new_item)
 
-    # Create Tracking
-    new_order_tracking = OrderTracking_TH(
-        order_id=order_id,
-        activity_msg=f"Created manual order to system",
-        user_id=data.user_id,
+def get_order_list_query(db):
+    return db.query(*ORDER_LIST_COLUMNS, User_TM.username).outerjoin(
+        User_TM, Order_TM.pic_user_id == User_TM.id
     )
 
-    db.add(new_order_tracking)
 
-    db.commit()
+def get_order_list_items(rows):
+    """
+    Map order list rows from `get_order_list_query` (extra trailing columns are
+    ignored) to `[{"order": {...}, "pic_username": ...}]`.
+    """
+    n = len(ORDER_LIST_KEYS)
+    return [
+        {"order": dict(zip(ORDER_LIST_KEYS, row)), "pic_username": row[n]}
+        for row in rows
+    ]
 
-    return {"msg": "Manual order successfully saved!"}
+
+def get_order_list_response(rows):
+    # Encoded straight with orjson
+    return FastJSONResponse(get_order_list_items(rows))
 
 
 @router.get("/get_all_orders")
-def get_all_orders(db: Session = Depends(get_db)):
-    res = (
-        db.query(Order_TM, User_TM.username)
-        .outerjoin(User_TM, Order_TM.pic_user_id == User_TM.id)
-        .order_by(Order_TM.id.desc())
-        .all()
+def get_all_orders(params: ListParams = Depends(), db: Session = Depends(get_db)):
+    res = get_list_page(
+        db,
+        Order_TM,
+        params,
+        ORDER_SORT_FIELDS,
+        extra_columns=[User_TM.username.label("pic_username")],
+        joins=[(User_TM, Order_TM.pic_user_id == User_TM.id)],
+        to_item=lambda order, row: {"order": order, "pic_username": row.pic_username},
     )
-    response_data = [
-        {"order": order.__dict__, "pic_username": username} for order, username in res
-    ]
-    return response_data
+    return FastJSONResponse(res)
+
+
+def get_last_3_months_start(now):
+    return now - timedelta(days=30)  # Assuming 30 days per month
+
+
+def get_order_bucket_filter(bucket, now=None):
+    """
+    Filter of an order list ("bucket") polled by the frontend.
+
+    `last_3_months` and `active` are the `/last_3_months` and
+    `/get_all_active_orders` lists, anything else is the `status` of
+    `/get_orders_by_status` (including `admin`). `now` (default: the current
+    time) places the window of the time-based `last_3_months` list.
+    """
+    if bucket == "last_3_months":
+        three_months_ago = get_last_3_months_start(now or datetime.now())
+        return Order_TM.feeding_dt >= three_months_ago
+    if bucket == "active":
+        return Order_TM.ecom_order_status.in_(ACTIVE_ECOM_STATUSES)
+    if bucket == "admin":
+        # If status is admin, include orders with status 000 or 200
+        return or_(
+            Order_TM.internal_status_id == "000",
+            Order_TM.internal_status_id == "200",
+        )
+    # For other statuses, filter by the specified status
+    return Order_TM.internal_status_id == bucket
 
 
 @router.get("/last_3_months")
 def get_active_orders(db: Session = Depends(get_db)):
-    three_months_ago = datetime.now() - timedelta(days=30)  # Assuming 30 days per month
-
     res = (
-        db.query(Order_TM, User_TM.username)
-        .outerjoin(User_TM, Order_TM.pic_user_id == User_TM.id)
-        .filter(Order_TM.feeding_dt >= three_months_ago)  # Filter by date
+        get_order_list_query(db)
+        .filter(get_order_bucket_filter("last_3_months"))  # Filter by date
         .order_by(Order_TM.id.desc())
         .all()
     )
 
-    response_data = [
-        {"order": order.__dict__, "pic_username": username} for order, username in res
-    ]
-
-    return response_data
+    return get_order_list_response(res)
 
 
 @router.get("/get_orders_by_status")
 def get_orders_by_status(status: str, db: Session = Depends(get_db)):
-    if status == "admin":
-        # If status is admin, include orders with status 000 or 200
-        res = (
-            db.query(Order_TM, User_TM.username)
-            .outerjoin(User_TM, Order_TM.pic_user_id == User_TM.id)
-            .filter(
-                or_(
-                    Order_TM.internal_status_id == "000",
-                    Order_TM.internal_status_id == "200",
-                )
-            )
-            .order_by(Order_TM.internal_status_id.desc(), Order_TM.id.desc())
-            .all()
-        )
-    else:
-        # For other statuses, filter by the specified status
-        res = (
-            db.query(Order_TM, User_TM.username)
-            .outerjoin(User_TM, Order_TM.pic_user_id == User_TM.id)
-            .filter(Order_TM.internal_status_id == status)
-            .order_by(Order_TM.internal_status_id.desc(), Order_TM.id.desc())
-            .all()
-        )
-
-    response_data = [
-        {"order": order.__dict__, "pic_username": username} for order, username in res
-    ]
+    res = (
+        get_order_list_query(db)
+        .filter(get_order_bucket_filter(status))
+        .order_by(Order_TM.internal_status_id.desc(), Order_TM.id.desc())
+        .all()
+    )
 
-    return response_data
+    return get_order_list_response(res)
 
 
 @router.get("/get_all_active_orders")
 def get_active_orders(db: Session = Depends(get_db)):
-    ecom_status_order_values = [220, 221, 400, 450]
     res = (
         db.query(Order_TM)
-        .filter(Order_TM.ecom_order_status.in_(ecom_status_order_values))
+        .filter(get_order_bucket_filter("active"))
         .order_by(Order_TM.pltf_deadline_dt.asc())
         .all()
     )
-    return res
+    return FastJSONResponse(res)
+
+
+@router.get("/changes")
+def get_order_changes(
+    bucket: str,
+    since: str = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Delta feed of an order list, see `get_order_bucket_filter` for `bucket`.
+
+    Without `since` the whole list is returned. Otherwise only orders created
+    or updated after the `since` watermark (minus a small overlap, clients
+    upsert by id): those still in the list under `orders`, those that left it
+    as tombstones under `removed`. Pass the returned `next_since` on the next
+    poll. `reset` is true when the delta was too big; reload without `since`.
+
+    For `last_3_months`, `removed` only lists orders that were in the list at
+    the watermark. The other buckets depend on statuses, whose previous value
+    is not stored: there `removed` lists every changed order outside the list,
+    including ones the client never had. Clients ignore unknown ids.
+    """
+    now = datetime.now()
+    bucket_filter = get_order_bucket_filter(bucket, now)
+
+    if since is None:
+        res = get_order_list_query(db).filter(bucket_filter).all()
+        return FastJSONResponse(
+            {
+                "next_since": now.isoformat(),
+                "reset": False,
+                "orders": get_order_list_items(res),
+                "removed": [],
+            }
+        )
+
+    try:
+        since_dt = datetime.fromisoformat(since)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid since ({since}), expected an ISO timestamp",
+        )
+
+    # Never move the watermark backwards, whatever the worker's clock says
+    next_since = max(now, since_dt)
+    changed_after = since_dt - timedelta(seconds=ORDER_DELTA_OVERLAP_SECONDS)
+
+    # Manual and app edits set last_updated_ts, synced orders only feeding_dt
+    changed_filter = or_(
+        Order_TM.last_updated_ts > changed_after,
+        Order_TM.feeding_dt > changed_after,
+    )
+    if bucket == "last_3_months":
+        # Only orders inside the window at the watermark can have left it,
+        # older ones are no tombstones. Those that aged out since did not
+        # change, but must be sent as removed
+        changed_filter = and_(
+            Order_TM.feeding_dt >= get_last_3_months_start(changed_after),
+            or_(changed_filter, Order_TM.feeding_dt < get_last_3_months_start(now)),
+        )
+
+    res = (
+        get_order_list_query(db)
+        .add_columns(case((bucket_filter, 1), else_=0).label("in_bucket"))
+        .filter(changed_filter)
+        .order_by(Order_TM.id)
+        .limit(ORDER_DELTA_MAX_ROWS + 1)
+        .all()
+    )
+
+    if len(res) > ORDER_DELTA_MAX_ROWS:
+        return FastJSONResponse(
+            {"next_since": None, "reset": True, "orders": [], "removed": []}
+        )
+
+    return FastJSONResponse(
+        {
+            "next_since": next_since.isoformat(),
+            "reset": False,
+            "orders": get_order_list_items(row for row in res if row.in_bucket),
+            "removed": [row.id for row in res if not row.in_bucket],
+        }
+    )
 
 
 @router.get("/get_batchfile_tasks")
@@ -188,7 +347,7 @@ def get_batchfile_tasks(db: Session = Depends(get_db)):
         .order_by(Order_TM.user_deadline_prd.asc())
         .all()
     )
-    return res
+    return FastJSONResponse(res)
 
 
 @router.post("/get_by_ecom_id")
@@ -213,74 +372,102 @@ def get_order_details(
             status_code=status.HTTP_404_NOT_FOUND, detail="No matching order found"
         )
 
-    # Convert the result to a dictionary for JSON output
-    order_data = order_tm.__dict__
+    return FastJSONResponse(order_tm)
 
-    return order_tm
 
+def load_order_details(db, id, include_trackings=True):
+    """
+    Load an order with its items, PIC username, batch name and (optionally)
+    its tracking history.
 
-@router.get("/id/{id}")
-def get_order_details(
-    id: str, Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)
-):
-    Authorize.jwt_required()
-    query = (
-        db.query(Order_TM, OrderItem_TR)
+    One joined query for the order and its items, one for the tracking rows.
+
+    Returns
+    -------
+    dict or None
+        None when the order (or its items) does not exist.
+    """
+    pic_user = aliased(User_TM)
+    rows = (
+        db.query(
+            Order_TM,
+            OrderItem_TR,
+            pic_user.username.label("pic_username"),
+            OrderBatchfile_TM.batch_name,
+        )
         .join(OrderItem_TR, Order_TM.ecom_order_id == OrderItem_TR.ecom_order_id)
+        .outerjoin(pic_user, pic_user.id == Order_TM.pic_user_id)
+        .outerjoin(OrderBatchfile_TM, OrderBatchfile_TM.id == Order_TM.batchfile_id)
         .filter(Order_TM.id == id)
         .all()
     )
 
-    if not query:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="ID not found"
+    if not rows:
+        return None
+
+    order_tm, _, pic_username, batch_name = rows[0]
+
+    result = {
+        "order_data": order_tm,
+        "order_items_data": [row[1] for row in rows],
+        "order_trackings": None,
+        "pic_username": pic_username,
+        "batch_name": batch_name,
+    }
+
+    if include_trackings:
+        # Fetch order tracking data and associated username
+        order_tracking_query = (
+            db.query(
+                OrderTracking_TH.id.label("order_tracking_id"),
+                OrderTracking_TH.order_id,
+                OrderTracking_TH.activity_date,
+                OrderTracking_TH.activity_msg,
+                OrderTracking_TH.user_id,
+                User_TM.username.label("user_name"),
+            )
+            .outerjoin(User_TM, OrderTracking_TH.user_id == User_TM.id)
+            .filter(OrderTracking_TH.order_id == id)
+            .order_by(OrderTracking_TH.id.desc())
+            .all()
         )
 
-    order_tm, order_items = zip(*query)
+        # Plain columns, no ORM objects to build per tracking row
+        result["order_trackings"] = [row._asdict() for row in order_tracking_query]
 
-    # Check pic_user_id against User_TM directly
-    pic_user_query = (
-        db.query(User_TM.username).filter(User_TM.id == order_tm[0].pic_user_id).first()
-    )
+    return result
 
-    # Check batchfile_id against OrderBatchfile_TM
-    batch = (
-        db.query(OrderBatchfile_TM.batch_name)
-        .filter(OrderBatchfile_TM.id == order_tm[0].batchfile_id)
-        .first()
-    )
 
-    result = {
-        "order_data": order_tm[0],
-        "order_items_data": order_items,
-        "order_trackings": [],
-        "pic_username": pic_user_query.username if pic_user_query else None,
-        "batch_name": batch.batch_name if batch else None,
-    }
+@router.get("/id/{id}")
+def get_order_details(
+    id: str,
+    include: str = "trackings",
+    Authorize: AuthJWT = Depends(),
+    db: Session = Depends(get_db),
+):
+    """
+    `include` is a comma separated list of optional parts, currently only
+    `trackings`. Pass an empty value to skip the tracking history
+    (`order_trackings` is then null).
+    """
+    Authorize.jwt_required()
 
-    # Fetch order tracking data and associated username
-    order_tracking_query = (
-        db.query(OrderTracking_TH, User_TM.username)
-        .outerjoin(User_TM, OrderTracking_TH.user_id == User_TM.id)
-        .filter(OrderTracking_TH.order_id == id)
-        .order_by(OrderTracking_TH.id.desc())
-        .all()
-    )
+    includes = {part.strip() for part in include.split(",") if part.strip()}
+    unknown = includes - ORDER_DETAIL_INCLUDES
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid include ({', '.join(sorted(unknown))}). Must be one of {', '.join(sorted(ORDER_DETAIL_INCLUDES))}.",
+        )
 
-    # Loop through the results and create a list of dictionaries with the required data
-    for tracking, username in order_tracking_query:
-        result["order_trackings"].append(
-            {
-                "order_tracking_id": tracking.id,
-                "order_id": tracking.order_id,
-                "activity_date": tracking.activity_date,
-                "activity_msg": tracking.activity_msg,
-                "user_id": tracking.user_id,
-                "user_name": username,
-            }
+    result = load_order_details(db, id, include_trackings="trackings" in includes)
+
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="ID not found"
         )
 
-    return result
+    return FastJSONResponse(result)
 
 
 @router.get("/id/{id}/get_comments")
@@ -328,13 +515,16 @@ def post_comment(
     order = check_if_order_exist(id, db)
     user = check_if_user_exist(data.user_id, db)
 
-    new_comment = OrderComment_TH(
-        creator_id=data.user_id, order_id=id, comment_text=data.comment
-    )
-
-    db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
+    with OrderUnitOfWork(db) as uow:
+        # A new comment counts as an order change for the delta feed
+        order.last_updated_ts = uow.now
+        uow.comment(order, data.comment, data.user_id)
+        uow.notify(
+            "updated",
+            [order.id],
+            to_status=order.internal_status_id,
+            batchfile_id=order.batchfile_id,
+        )
 
     return {"msg": f"Comment successfully saved!"}
 
@@ -350,48 +540,54 @@ def update_order(
 
     order = check_if_order_exist(id, db)
 
-    order.initial_input_dt = (
-        data.initial_input_dt if data.initial_input_dt else datetime.now()
-    )
-    order.cust_phone_no = (
-        data.cust_phone_no if data.cust_phone_no else order.cust_phone_no
-    )
-    order.user_deadline_prd = (
-        data.user_deadline_prd if data.user_deadline_prd else order.user_deadline_prd
-    )
-    order.design_sub_dt = (
-        data.design_sub_dt if data.design_sub_dt else order.design_sub_dt
-    )
-    order.design_acc_dt = (
-        data.design_acc_dt if data.design_acc_dt else order.design_acc_dt
-    )
-    order.google_folder_url = (
-        data.google_folder_url if data.google_folder_url else order.google_folder_url
-    )
-    order.google_file_url = (
-        data.google_file_url if data.google_file_url else order.google_file_url
-    )
-    order.print_done_dt = (
-        data.print_done_dt if data.print_done_dt else order.print_done_dt
-    )
-    order.packing_done_dt = (
-        data.packing_done_dt if data.packing_done_dt else order.packing_done_dt
-    )
-
-    db.commit()
-    db.refresh(order)
-
-    # Format the date string as "YYYY-MM-DD"
-    formatted_date_str = f"{order.user_deadline_prd[:4]}-{order.user_deadline_prd[4:6]}-{order.user_deadline_prd[6:]}"
+    with OrderUnitOfWork(db) as uow:
+        order.last_updated_ts = uow.now
+        order.initial_input_dt = (
+            data.initial_input_dt if data.initial_input_dt else uow.now
+        )
+        order.cust_phone_no = (
+            data.cust_phone_no if data.cust_phone_no else order.cust_phone_no
+        )
+        order.user_deadline_prd = (
+            data.user_deadline_prd
+            if data.user_deadline_prd
+            else order.user_deadline_prd
+        )
+        order.design_sub_dt = (
+            data.design_sub_dt if data.design_sub_dt else order.design_sub_dt
+        )
+        order.design_acc_dt = (
+            data.design_acc_dt if data.design_acc_dt else order.design_acc_dt
+        )
+        order.google_folder_url = (
+            data.google_folder_url
+            if data.google_folder_url
+            else order.google_folder_url
+        )
+        order.google_file_url = (
+            data.google_file_url if data.google_file_url else order.google_file_url
+        )
+        order.print_done_dt = (
+            data.print_done_dt if data.print_done_dt else order.print_done_dt
+        )
+        order.packing_done_dt = (
+            data.packing_done_dt if data.packing_done_dt else order.packing_done_dt
+        )
 
-    new_order_tracking = OrderTracking_TH(
-        order_id=order.id,
-        activity_msg=f"Updated Customer Phone Number to ({order.cust_phone_no}) and Deadline Date to ({formatted_date_str})",
-        user_id=data.user_id,
-    )
+        # Format the date string as "YYYY-MM-DD"
+        formatted_date_str = f"{order.user_deadline_prd[:4]}-{order.user_deadline_prd[4:6]}-{order.user_deadline_prd[6:]}"
 
-    db.add(new_order_tracking)
-    db.commit()
+        uow.track(
+            order,
+            f"Updated Customer Phone Number to ({order.cust_phone_no}) and Deadline Date to ({formatted_date_str})",
+            data.user_id,
+        )
+        uow.notify(
+            "updated",
+            [order.id],
+            to_status=order.internal_status_id,
+            batchfile_id=order.batchfile_id,
+        )
 
     return {"msg": f"Update successful"}
 
@@ -423,31 +619,33 @@ def update_order(
         create_thumbnail_url(data.thumb_file_url) if data.thumb_file_url else None
     )
 
-    order.google_folder_url = (
-        data.folder_url if data.folder_url else order.google_folder_url
-    )
-    order.google_file_url = (
-        data.thumb_file_url if data.thumb_file_url else order.google_file_url
-    )
-    order.thumb_url = extracted_thumb_url
-    order.last_updated_ts = datetime.now()
-    order.design_sub_dt = datetime.now()
-    if before_internal_status_id == "100":
-        order.pic_user_id = None
-        order.internal_status_id = "200"
-
-    db.commit()
-    db.refresh(order)
-
-    # Insert a new row in ordertracking_th
-    new_order_tracking = OrderTracking_TH(
-        order_id=order.id,
-        activity_msg=f"Updated Design URL to ({order.google_folder_url}) and Thumbnail URL to ({order.google_file_url})",
-        user_id=data.user_id,
-    )
+    with OrderUnitOfWork(db) as uow:
+        order.google_folder_url = (
+            data.folder_url if data.folder_url else order.google_folder_url
+        )
+        order.google_file_url = (
+            data.thumb_file_url if data.thumb_file_url else order.google_file_url
+        )
+        order.thumb_url = extracted_thumb_url
+        order.last_updated_ts = uow.now
+        order.design_sub_dt = uow.now
+        if before_internal_status_id == "100":
+            order.pic_user_id = None
+            order.internal_status_id = "200"
 
-    db.add(new_order_tracking)
-    db.commit()
+        # Insert a new row in ordertracking_th
+        uow.track(
+            order,
+            f"Updated Design URL to ({order.google_folder_url}) and Thumbnail URL to ({order.google_file_url})",
+            data.user_id,
+        )
+        uow.notify(
+            "status",
+            [order.id],
+            before_internal_status_id,
+            order.internal_status_id,
+            batchfile_id=order.batchfile_id,
+        )
 
     return {"msg": f"Update successful"}
 
@@ -468,22 +666,23 @@ def update_thumb_url(
 
     extracted_thumb_url = create_thumbnail_url(data.payload) if data.payload else None
 
-    order.google_file_url = data.payload if data.payload else order.google_file_url
-    order.thumb_url = extracted_thumb_url
-    order.last_updated_ts = datetime.now()
-
-    db.commit()
-    db.refresh(order)
+    with OrderUnitOfWork(db) as uow:
+        order.google_file_url = data.payload if data.payload else order.google_file_url
+        order.thumb_url = extracted_thumb_url
+        order.last_updated_ts = uow.now
 
-    # Insert a new row in ordertracking_th
-    new_order_tracking = OrderTracking_TH(
-        order_id=order.id,
-        activity_msg=f"Updated Thumbnail URL to ({order.google_file_url})",
-        user_id=data.user_id,
-    )
-
-    db.add(new_order_tracking)
-    db.commit()
+        # Insert a new row in ordertracking_th
+        uow.track(
+            order,
+            f"Updated Thumbnail URL to ({order.google_file_url})",
+            data.user_id,
+        )
+        uow.notify(
+            "updated",
+            [order.id],
+            to_status=order.internal_status_id,
+            batchfile_id=order.batchfile_id,
+        )
 
     return {"msg": f"Update successful"}
 
@@ -516,21 +715,23 @@ def update_order_pic(
     before_pic_name = get_user_name(db, order.pic_user_id)
     after_pic_name = get_user_name(db, data.pic_id)
 
-    # Update the pic_user_id
-    order.pic_user_id = data.pic_id
-    order.last_updated_ts = datetime.now()
-
-    # Create the message
-    message = f"PIC was updated from ({before_pic_name}) to ({after_pic_name})"
+    with OrderUnitOfWork(db) as uow:
+        # Update the pic_user_id
+        order.pic_user_id = data.pic_id
+        order.last_updated_ts = uow.now
 
-    # Create an order tracking entry for the message
-    new_order_tracking = OrderTracking_TH(
-        order_id=order.id,
-        activity_msg=message,
-        user_id=data.user_id,
-    )
-    db.add(new_order_tracking)
-    db.commit()
+        # Create an order tracking entry for the message
+        uow.track(
+            order,
+            f"PIC was updated from ({before_pic_name}) to ({after_pic_name})",
+            data.user_id,
+        )
+        uow.notify(
+            "updated",
+            [order.id],
+            to_status=order.internal_status_id,
+            batchfile_id=order.batchfile_id,
+        )
 
     return {"msg": "Update successful"}
 
@@ -560,47 +761,48 @@ def update_order_initial_data(
     phone_no_changed = before_phone_no != data.cust_phone_no
     deadline_changed = before_user_deadline_prd != data.user_deadline_prd
 
-    order.cust_phone_no = data.cust_phone_no
-    order.user_deadline_prd = data.user_deadline_prd
-    order.initial_input_dt = datetime.now()
-    order.last_updated_ts = datetime.now()
-    if before_internal_status_id == "000":
-        order.pic_user_id = None
-        order.internal_status_id = "100"
-
-    # Create update messages only if values change
-    update_messages = []
-    if phone_no_changed:
-        if before_phone_no:
-            update_messages.append(
-                f"Updated phone number from '{before_phone_no}' to '{data.cust_phone_no}'"
-            )
-        else:
-            update_messages.append(f"Set phone number to '{data.cust_phone_no}'")
-
-    if deadline_changed:
-        if before_user_deadline_prd:
-            update_messages.append(
-                f"Updated deadline from '{before_user_deadline_prd}' to '{data.user_deadline_prd}'"
-            )
-        else:
-            update_messages.append(f"Set deadline to '{data.user_deadline_prd}'")
-
-    if data.pic_user_id:
-        order.pic_user_id = data.pic_user_id
-        after_pic_name = get_user_name(db, data.pic_user_id)
-        update_messages.append(f"PIC set to {after_pic_name}")
-
-    msg = " and ".join(update_messages)
+    with OrderUnitOfWork(db) as uow:
+        order.cust_phone_no = data.cust_phone_no
+        order.user_deadline_prd = data.user_deadline_prd
+        order.initial_input_dt = uow.now
+        order.last_updated_ts = uow.now
+        if before_internal_status_id == "000":
+            order.pic_user_id = None
+            order.internal_status_id = "100"
+
+        # Create update messages only if values change
+        update_messages = []
+        if phone_no_changed:
+            if before_phone_no:
+                update_messages.append(
+                    f"Updated phone number from '{before_phone_no}' to '{data.cust_phone_no}'"
+                )
+            else:
+                update_messages.append(f"Set phone number to '{data.cust_phone_no}'")
 
-    if msg:
-        new_order_tracking = OrderTracking_TH(
-            order_id=order.id, activity_msg=msg, user_id=data.user_id
+        if deadline_changed:
+            if before_user_deadline_prd:
+                update_messages.append(
+                    f"Updated deadline from '{before_user_deadline_prd}' to '{data.user_deadline_prd}'"
+                )
+            else:
+                update_messages.append(f"Set deadline to '{data.user_deadline_prd}'")
+
+        if data.pic_user_id:
+            order.pic_user_id = data.pic_user_id
+            after_pic_name = get_user_name(db, data.pic_user_id)
+            update_messages.append(f"PIC set to {after_pic_name}")
+
+        msg = " and ".join(update_messages)
+        if msg:
+            uow.track(order, msg, data.user_id)
+        uow.notify(
+            "status",
+            [order.id],
+            before_internal_status_id,
+            order.internal_status_id,
+            batchfile_id=order.batchfile_id,
         )
-
-        db.add(new_order_tracking)
-
-    db.commit()
     return {"msg": "Update successful"}
 
 
@@ -623,19 +825,22 @@ def update_order_design_acc(
             detail=f"Request is conflicted. Please refresh page!",
         )
 
-    order.design_acc_dt = data.date if data.date else datetime.now()
-    order.last_updated_ts = datetime.now()
-    if before_internal_status_id == "200":
-        order.pic_user_id = None
-        order.internal_status_id = "250"
-
-    # Insert a new row in ordertracking_th
-    new_order_tracking = OrderTracking_TH(
-        order_id=order.id, activity_msg=f"Approved Design", user_id=data.user_id
-    )
+    with OrderUnitOfWork(db) as uow:
+        order.design_acc_dt = data.date if data.date else uow.now
+        order.last_updated_ts = uow.now
+        if before_internal_status_id == "200":
+            order.pic_user_id = None
+            order.internal_status_id = "250"
 
-    db.add(new_order_tracking)
-    db.commit()
+        # Insert a new row in ordertracking_th
+        uow.track(order, "Approved Design", data.user_id)
+        uow.notify(
+            "status",
+            [order.id],
+            before_internal_status_id,
+            order.internal_status_id,
+            batchfile_id=order.batchfile_id,
+        )
     return {"msg": f"Update successful"}
 
 
@@ -658,19 +863,22 @@ def update_order_design_rej(
             detail=f"Request is conflicted. Please refresh page!",
         )
 
-    order.last_updated_ts = datetime.now()
-    if before_internal_status_id == "200":
-        order.design_sub_dt = None
-        order.pic_user_id = None
-        order.internal_status_id = "100"
-
-    # Insert a new row in ordertracking_th
-    new_order_tracking = OrderTracking_TH(
-        order_id=order.id, activity_msg=f"Rejected Design", user_id=data.user_id
-    )
+    with OrderUnitOfWork(db) as uow:
+        order.last_updated_ts = uow.now
+        if before_internal_status_id == "200":
+            order.design_sub_dt = None
+            order.pic_user_id = None
+            order.internal_status_id = "100"
 
-    db.add(new_order_tracking)
-    db.commit()
+        # Insert a new row in ordertracking_th
+        uow.track(order, "Rejected Design", data.user_id)
+        uow.notify(
+            "status",
+            [order.id],
+            before_internal_status_id,
+            order.internal_status_id,
+            batchfile_id=order.batchfile_id,
+        )
     return {"msg": f"Update successful"}
 
 
@@ -693,19 +901,22 @@ def update_order_print_done(
             detail=f"Request is conflicted. Please refresh page!",
         )
 
-    order.print_done_dt = data.date if data.date else datetime.now()
-    order.last_updated_ts = datetime.now()
-    if before_internal_status_id == "300":
-        order.pic_user_id = None
-        order.internal_status_id = "400"
-
-    # Insert a new row in ordertracking_th
-    new_order_tracking = OrderTracking_TH(
-        order_id=order.id, activity_msg=f"Printing Process Done", user_id=data.user_id
-    )
+    with OrderUnitOfWork(db) as uow:
+        order.print_done_dt = data.date if data.date else uow.now
+        order.last_updated_ts = uow.now
+        if before_internal_status_id == "300":
+            order.pic_user_id = None
+            order.internal_status_id = "400"
 
-    db.add(new_order_tracking)
-    db.commit()
+        # Insert a new row in ordertracking_th
+        uow.track(order, "Printing Process Done", data.user_id)
+        uow.notify(
+            "status",
+            [order.id],
+            before_internal_status_id,
+            order.internal_status_id,
+            batchfile_id=order.batchfile_id,
+        )
 
     return {"msg": f"Update successful"}
 
@@ -729,23 +940,142 @@ def update_order_packing_done(
             detail=f"Request is conflicted. Please refresh page!",
         )
 
-    order.packing_done_dt = data.date if data.date else datetime.now()
-    order.last_updated_ts = datetime.now()
-    if before_internal_status_id == "400":
-        order.pic_user_id = None
-        order.internal_status_id = "999"
-
-    # Insert a new row in ordertracking_th
-    new_order_tracking = OrderTracking_TH(
-        order_id=order.id, activity_msg=f"Packing Process Done", user_id=data.user_id
-    )
+    with OrderUnitOfWork(db) as uow:
+        order.packing_done_dt = data.date if data.date else uow.now
+        order.last_updated_ts = uow.now
+        if before_internal_status_id == "400":
+            order.pic_user_id = None
+            order.internal_status_id = "999"
 
-    db.add(new_order_tracking)
-    db.commit()
+        # Insert a new row in ordertracking_th
+        uow.track(order, "Packing Process Done", data.user_id)
+        uow.notify(
+            "status",
+            [order.id],
+            before_internal_status_id,
+            order.internal_status_id,
+            batchfile_id=order.batchfile_id,
+        )
 
     return {"msg": f"Update successful"}
 
 
+@router.patch("/bulk/transition")
+def bulk_order_transition(
+    data: OrderBulkTransitionPayload,
+    Authorize: AuthJWT = Depends(),
+    db: Session = Depends(get_db),
+):
+    Authorize.jwt_required()
+
+    transition = ORDER_TRANSITIONS.get(data.step)
+    if not transition:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown step ({data.step}), expected one of {', '.join(ORDER_TRANSITIONS)}",
+        )
+
+    ids = list(dict.fromkeys(data.order_ids))
+
+    with OrderUnitOfWork(db) as uow:
+        # Data Stale Validation, rows stay locked until the commit
+        rows = (
+            db.query(Order_TM.id, Order_TM.internal_status_id, Order_TM.batchfile_id)
+            .filter(Order_TM.id.in_(ids))
+            .with_for_update()
+            .all()
+        )
+        current_status = {row.id: row.internal_status_id for row in rows}
+        order_batchfile_ids = {row.id: row.batchfile_id for row in rows}
+
+        results = []
+        updated_ids = []
+        for order_id in ids:
+            if order_id not in current_status:
+                result = "not_found"
+            elif current_status[order_id] != transition["from"]:
+                result = "conflict"
+            else:
+                result = "updated"
+                updated_ids.append(order_id)
+
+            results.append(
+                {
+                    "order_id": order_id,
+                    "result": result,
+                    "internal_status_id": current_status.get(order_id),
+                }
+            )
+
+        if updated_ids:
+            values = {
+                "internal_status_id": transition["to"],
+                "pic_user_id": None,
+                "last_updated_ts": uow.now,
+            }
+            if transition["date_field"]:
+                values[transition["date_field"]] = data.date if data.date else uow.now
+            for field in transition["clear"]:
+                values[field] = None
+
+            db.query(Order_TM).filter(
+                Order_TM.id.in_(updated_ids),
+                Order_TM.internal_status_id == transition["from"],
+            ).update(values, synchronize_session=False)
+
+            uow.track_many(updated_ids, transition["msg"], data.user_id)
+
+            # One event per batch, so batch boards see their orders move
+            batch_order_ids = defaultdict(list)
+            for order_id in updated_ids:
+                batch_order_ids[order_batchfile_ids[order_id]].append(order_id)
+            for batchfile_id, order_ids in batch_order_ids.items():
+                uow.notify(
+                    "status",
+                    order_ids,
+                    transition["from"],
+                    transition["to"],
+                    batchfile_id=batchfile_id,
+                )
+
+            for result in results:
+                if result["result"] == "updated":
+                    result["internal_status_id"] = transition["to"]
+
+    return {
+        "msg": f"Updated {len(updated_ids)} of {len(ids)} orders",
+        "updated": len(updated_ids),
+        "skipped": len(ids) - len(updated_ids),
+        "results": results,
+    }
+
+
+def get_batchfile_result_list(db, res):
+    # All orders of all listed batches in one query, grouped here
+    batchfile_ids = [order_batchfile.id for order_batchfile, _, _ in res]
+    batch_orders = defaultdict(list)
+    if batchfile_ids:
+        order_list = (
+            db.query(Order_TM)
+            .filter(Order_TM.batchfile_id.in_(batchfile_ids))
+            .order_by(Order_TM.id)
+            .all()
+        )
+        for order in order_list:
+            batch_orders[order.batchfile_id].append(orm_to_dict(order))
+
+    result_list = []
+    for order_batchfile, designer_username, printer_username in res:
+        order_dict = orm_to_dict(order_batchfile)
+        order_dict["designer_username"] = designer_username
+        order_dict["printer_username"] = printer_username
+        order_dict["batch_order_list"] = batch_orders[order_batchfile.id]
+
+        result_list.append(order_dict)
+
+    return result_list
+
+
 @router.get("/batchfile/last_3_month")
 def get_batchfile_last3month(db: Session = Depends(get_db)):
     three_months_ago = datetime.now() - timedelta(days=30)
@@ -767,22 +1097,7 @@ def get_batchfile_last3month(db: Session = Depends(get_db)):
         .all()
     )
 
-    result_list = []
-    for order_batchfile, designer_username, printer_username in res:
-        order_dict = order_batchfile.__dict__
-        order_dict["designer_username"] = designer_username
-        order_dict["printer_username"] = printer_username
-
-        # Get Order_TM data for the current batch
-        order_list = (
-            db.query(Order_TM).filter(Order_TM.batchfile_id == order_batchfile.id).all()
-        )
-
-        order_dict["batch_order_list"] = [order.__dict__ for order in order_list]
-
-        result_list.append(order_dict)
-
-    return result_list
+    return get_batchfile_result_list(db, res)
 
 
 @router.get("/batchfile/active")
@@ -805,22 +1120,7 @@ def get_batchfile_last3month(db: Session = Depends(get_db)):
         .all()
     )
 
-    result_list = []
-    for order_batchfile, designer_username, printer_username in res:
-        order_dict = order_batchfile.__dict__
-        order_dict["designer_username"] = designer_username
-        order_dict["printer_username"] = printer_username
-
-        # Get Order_TM data for the current batch
-        order_list = (
-            db.query(Order_TM).filter(Order_TM.batchfile_id == order_batchfile.id).all()
-        )
-
-        order_dict["batch_order_list"] = [order.__dict__ for order in order_list]
-
-        result_list.append(order_dict)
-
-    return result_list
+    return get_batchfile_result_list(db, res)
 
 
 @router.patch("/batchfile/id/{id}/submit_print_done")
@@ -838,35 +1138,51 @@ def submit_batchfile_print_done(
     # Check if batchfileID exists
     batchfile = check_if_batchfile_exist(id, db)
 
-    # Data Stale Validation
-    if batchfile.printed_dt != None:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=f"Request is conflicted. Please refresh page!",
+    with OrderUnitOfWork(db) as uow:
+        # Update batchFile, guarded so a concurrent submit cannot print it twice
+        updated = (
+            db.query(OrderBatchfile_TM)
+            .filter(
+                OrderBatchfile_TM.id == batchfile.id,
+                OrderBatchfile_TM.printed_dt.is_(None),
+            )
+            .update(
+                {"printer_user_id": printer.id, "printed_dt": uow.now},
+                synchronize_session=False,
+            )
         )
 
-    # Update batchFile
-    batchfile.printer_user_id = printer.id
-    batchfile.printed_dt = datetime.now()
+        # Data Stale Validation
+        if not updated:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Request is conflicted. Please refresh page!",
+            )
 
-    # Update orders
-    related_orders = (
-        db.query(Order_TM).filter(Order_TM.batchfile_id == batchfile.id).all()
-    )
-    for o in related_orders:
-        o.print_done_dt = datetime.now()
-        o.last_updated_ts = datetime.now()
-        o.internal_status_id = "400"
+        # Update orders
+        db.query(Order_TM).filter(Order_TM.batchfile_id == batchfile.id).update(
+            {
+                "print_done_dt": uow.now,
+                "last_updated_ts": uow.now,
+                "internal_status_id": "400",
+            },
+            synchronize_session=False,
+        )
 
-        # Insert a new row in ordertracking_th
-        new_order_tracking = OrderTracking_TH(
-            order_id=o.id,
-            activity_msg=f"Printing Process Done (BatchFile {batchfile.batch_name})",
-            user_id=printer.id,
+        # Insert a row in ordertracking_th for every order of the batch
+        uow.track_query(
+            db.query(Order_TM.id).filter(Order_TM.batchfile_id == batchfile.id),
+            f"Printing Process Done (BatchFile {batchfile.batch_name})",
+            printer.id,
         )
 
-        db.add(new_order_tracking)
-    db.commit()
+        batch_order_ids = [
+            order_id
+            for (order_id,) in db.query(Order_TM.id).filter(
+                Order_TM.batchfile_id == batchfile.id
+            )
+        ]
+        uow.notify("status", batch_order_ids, "300", "400", batchfile_id=batchfile.id)
 
     return {"msg": f"Update successful"}
 
@@ -879,52 +1195,62 @@ def create_batchfile(
 ):
     Authorize.jwt_required()
 
-    validated_orders = []
+    order_ids = list(dict.fromkeys(data.order_ids))
 
-    # Check if all Order is valid
-    for order_id in data.order_ids:
-        order = check_if_order_exist(order_id, db)
+    # Check if all Order is valid, the rows stay locked until the commit so a
+    # concurrent batch of the same orders waits and then fails the stale check
+    current_status = dict(
+        db.query(Order_TM.id, Order_TM.internal_status_id)
+        .filter(Order_TM.id.in_(order_ids))
+        .with_for_update()
+        .all()
+    )
+
+    for order_id in order_ids:
+        if order_id not in current_status:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"OrderID {order_id} not found",
+            )
 
         # Data Stale Validation
-        if order.internal_status_id != "250":
+        if current_status[order_id] != "250":
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail=f"Request is conflicted. Please refresh page!",
             )
 
-        validated_orders.append(order)
-
     # Check if designer_id is valid
     designer = check_if_user_exist(data.designer_id, db)
 
-    # Create BatchFile
-    new_batch = OrderBatchfile_TM(
-        batch_name=generate_readable_id(),
-        remarks=data.remarks,
-        create_dt=datetime.now(),
-        designer_user_id=designer.id,
-    )
+    batch_name = generate_readable_id()
 
-    db.add(new_batch)
-    db.commit()
-    db.refresh(new_batch)
-
-    # Update Each Order
-    for order in validated_orders:
-        order.last_updated_ts = datetime.now()
-        order.batch_done_dt = datetime.now()
-        order.batchfile_id = new_batch.id
-        order.internal_status_id = "300"
-
-        new_order_tracking = OrderTracking_TH(
-            order_id=order.id,
-            activity_msg=f"Assigned to BatchFile ({new_batch.batch_name})",
-            user_id=designer.id,
+    with OrderUnitOfWork(db) as uow:
+        # Create BatchFile, the flush assigns its id for the orders
+        new_batch = uow.add(
+            OrderBatchfile_TM(
+                batch_name=batch_name,
+                remarks=data.remarks,
+                create_dt=uow.now,
+                designer_user_id=designer.id,
+            )
+        )
+        uow.flush()
+
+        # Update all Orders in one statement
+        db.query(Order_TM).filter(Order_TM.id.in_(order_ids)).update(
+            {
+                "last_updated_ts": uow.now,
+                "batch_done_dt": uow.now,
+                "batchfile_id": new_batch.id,
+                "internal_status_id": "300",
+            },
+            synchronize_session=False,
         )
 
-        db.add(new_order_tracking)
-    db.commit()
-    return {"msg": f"Create BatchFile ({new_batch.batch_name}) successful"}
+        uow.track_many(order_ids, f"Assigned to BatchFile ({batch_name})", designer.id)
+        uow.notify("status", order_ids, "250", "300", batchfile_id=new_batch.id)
+    return {"msg": f"Create BatchFile ({batch_name}) successful"}
 
 
 def check_if_order_exist(id, db: Session):
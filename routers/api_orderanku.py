@@ -1,9 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi_jwt_auth import AuthJWT
-from sqlalchemy import or_
 from sqlalchemy.orm import Session
-from pdf_orderanku_module import generate_orderanku
+from render_executor import get_render_executor, render_orderanku_pdf
+from pagination import paginate_keyset
+from json_response import FastJSONResponse
+from search_index import (
+    filter_orders_by_text,
+    filter_by_phone,
+    get_phone_key_values,
+    index_order,
+    set_phone_keys,
+    set_updated_date,
+)
+from print_jobs import (
+    JOB_DONE,
+    submit_print_job,
+    render_print_job,
+    get_print_job,
+    get_print_job_file,
+)
+from event_bus import publish_orderanku_event
 from datetime import datetime
 from math import ceil
 
@@ -12,13 +30,18 @@ from schemas import (
     OrderankuSellerEditForm,
     OrderankuItemCreateForm,
     OrderankuItemEditForm,
-    OrderankuListIdPayload,
+    OrderIdListPayload,
 )
 
-from database import get_db, OrderankuItem_TM, OrderankuSeller_TR
+from database import get_db, SessionLocal, OrderankuItem_TM, OrderankuSeller_TR
 
 router = APIRouter(tags=["API Orderanku"], prefix="/api_orderanku")
 
+# Batches from this size on are rendered to a file instead of built in memory
+STREAM_MIN_ORDERS = 100
+# Ids per IN (...) list of the bulk validate/update statements
+BULK_CHUNK_SIZE = 1000
+
 
 def validate_orders(db, order_ids):
     ids = list(set(order_ids))
@@ -43,6 +66,118 @@ def validate_orders(db, order_ids):
     return orders
 
 
+def get_active_order(db, id):
+    order = (
+        db.query(OrderankuItem_TM)
+        .filter(OrderankuItem_TM.id == id)
+        .filter(OrderankuItem_TM.is_active == 1)
+        .first()
+    )
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Orderanku ID ({id}) not found / inactive",
+        )
+    return order
+
+
+def chunk_ids(ids, size=BULK_CHUNK_SIZE):
+    for i in range(0, len(ids), size):
+        yield ids[i : i + size]
+
+
+def find_active_order_ids(db, ids):
+    # Id-only validation, no ORM objects loaded. The rows stay locked until
+    # the commit, so none can be deactivated before it is updated
+    found_ids = set()
+    for chunk in chunk_ids(ids):
+        found_ids.update(
+            order_id
+            for (order_id,) in db.query(OrderankuItem_TM.id)
+            .filter(OrderankuItem_TM.id.in_(chunk), OrderankuItem_TM.is_active == 1)
+            .with_for_update()
+        )
+    return found_ids
+
+
+def bulk_update_orders(db, order_ids, values, action, partial=False):
+    """
+    Apply `values` to the given active orders with one UPDATE per chunk.
+
+    Unknown or inactive ids raise 404 like `validate_orders`, unless `partial`
+    is set, in which case they are skipped. The found orders are locked, so
+    exactly those are updated. Everything is committed at once, then an
+    `action` event is published for the updated orders.
+    """
+    ids = sorted(set(order_ids))
+    found_ids = find_active_order_ids(db, ids)
+    not_found_ids = [id for id in ids if id not in found_ids]
+
+    if not_found_ids and not partial:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Orderanku IDs ({', '.join(map(str, not_found_ids))}) not found / inactive",
+        )
+
+    updated_ids = sorted(found_ids)
+    for chunk in chunk_ids(updated_ids):
+        db.query(OrderankuItem_TM).filter(OrderankuItem_TM.id.in_(chunk)).update(
+            values, synchronize_session=False
+        )
+    db.commit()
+
+    publish_orderanku_event(action, updated_ids)
+
+    return {
+        "found": len(found_ids),
+        "updated": len(updated_ids),
+        "skipped": len(not_found_ids),
+        "skipped_ids": not_found_ids,
+    }
+
+
+def get_resi_data(order):
+    inv_date = (
+        order.created_date.strftime("%Y-%m-%d %H:%M:%S") if order.created_date else None
+    )
+    address_parts = [
+        order.recipient_address,
+        order.recipient_kelurahan,
+        order.recipient_kecamatan,
+        order.recipient_kota_kab,
+        order.recipient_provinsi,
+        order.recipient_postal,
+    ]
+
+    filtered_address_parts = [part for part in address_parts if part]
+
+    order_addr = ", ".join(filtered_address_parts)
+
+    return {
+        "orderanku_id": order.id,
+        "receipent_name": order.recipient_name,
+        "receipent_telp": order.recipient_phone,
+        "receipent_addr": order_addr,
+        "sender_name": order.seller_name,
+        "sender_telp": order.seller_phone,
+        "total_amount": float(order.order_total),
+        "bank_name": order.order_bank,
+        "order_detail": order.order_details,
+        "paid_flag": True if order.paid_date else False,
+        "invoice_date": inv_date,
+    }
+
+
+def update_print_date(db, order_ids):
+    # Update the print_date for all processed orders
+    db.query(OrderankuItem_TM).filter(OrderankuItem_TM.id.in_(order_ids)).update(
+        {"print_date": datetime.now()}, synchronize_session=False
+    )
+    db.commit()
+
+    publish_orderanku_event("printed", order_ids)
+
+
 @router.get("/order")
 def get_orders(
     sort_field: str = "id",
@@ -61,6 +196,9 @@ def get_orders(
     flag_active: int = 1,  # 0 Not Active, 1 Active, 2 All
     seller_name: str = None,
     seller_phone: str = None,
+    pagination: str = "page",  # page or cursor
+    cursor: str = None,
+    with_total: bool = False,  # cursor mode only, page mode always counts
     Authorize: AuthJWT = Depends(),
     db: Session = Depends(get_db),
 ):
@@ -77,26 +215,13 @@ def get_orders(
         query = query.filter(OrderankuItem_TM.created_date <= created_date_to_dt)
 
     if recipient_name:
-        query = query.filter(
-            OrderankuItem_TM.recipient_name.ilike(f"%{recipient_name}%")
-        )
+        query = filter_orders_by_text(query, "recipient_name", recipient_name)
 
     if recipient_phone:
-        query = query.filter(
-            OrderankuItem_TM.recipient_phone.ilike(f"%{recipient_phone}%")
-        )
+        query = filter_orders_by_text(query, "recipient_phone", recipient_phone)
 
     if recipient_addr:
-        query = query.filter(
-            or_(
-                OrderankuItem_TM.recipient_postal.ilike(f"%{recipient_addr}%"),
-                OrderankuItem_TM.recipient_provinsi.ilike(f"%{recipient_addr}%"),
-                OrderankuItem_TM.recipient_kota_kab.ilike(f"%{recipient_addr}%"),
-                OrderankuItem_TM.recipient_kecamatan.ilike(f"%{recipient_addr}%"),
-                OrderankuItem_TM.recipient_kelurahan.ilike(f"%{recipient_addr}%"),
-                OrderankuItem_TM.recipient_address.ilike(f"%{recipient_addr}%"),
-            )
-        )
+        query = filter_orders_by_text(query, "recipient_addr", recipient_addr)
 
     if total_from:
         query = query.filter(OrderankuItem_TM.order_total >= total_from)
@@ -123,10 +248,10 @@ def get_orders(
         query = query.filter(OrderankuItem_TM.is_active == 0)
 
     if seller_name:
-        query = query.filter(OrderankuItem_TM.seller_name.ilike(f"%{seller_name}%"))
+        query = filter_orders_by_text(query, "seller_name", seller_name)
 
     if seller_phone:
-        query = query.filter(OrderankuItem_TM.seller_phone.ilike(f"%{seller_phone}%"))
+        query = filter_orders_by_text(query, "seller_phone", seller_phone)
     # endregion
 
     # region Sorting Logic
@@ -142,59 +267,76 @@ def get_orders(
 
     sort_field_mapped = sort_mapping.get(sort_field.lower(), OrderankuItem_TM.id)
 
-    if sort_order.lower() == "desc":
-        query = query.order_by(sort_field_mapped.desc())
+    if pagination == "cursor":
+        page_info = paginate_keyset(
+            query,
+            sort_field_mapped,
+            OrderankuItem_TM.id,
+            sort_order.lower() == "desc",
+            per_page,
+            cursor,
+            with_total,
+        )
+        results = page_info.pop("results")
     else:
-        query = query.order_by(sort_field_mapped.asc())
-    # endregion
+        if sort_order.lower() == "desc":
+            query = query.order_by(sort_field_mapped.desc())
+        else:
+            query = query.order_by(sort_field_mapped.asc())
 
-    total_results = query.count()
+        total_results = query.count()
 
-    max_page = max(1, ceil(total_results / per_page)) if total_results > 0 else 1
-    page = min(max_page, max(1, page))
+        max_page = max(1, ceil(total_results / per_page)) if total_results > 0 else 1
+        page = min(max_page, max(1, page))
 
-    results = query.offset((page - 1) * per_page).limit(per_page).all()
+        results = query.offset((page - 1) * per_page).limit(per_page).all()
+        page_info = {
+            "total_results": total_results,
+            "page": page,
+            "max_page": max_page,
+        }
+    # endregion
 
-    return {
-        "total_results": total_results,
-        "page": page,
-        "max_page": max_page,
-        "sellers": [
-            {
-                "id": result.id,
-                "recipient_name": result.recipient_name,
-                "recipient_phone": result.recipient_phone,
-                "recipient_address_display": ", ".join(
-                    [
-                        value
-                        for value in [
-                            result.recipient_address,
-                            result.recipient_kelurahan,
-                            result.recipient_kecamatan,
-                            result.recipient_kota_kab,
-                            result.recipient_provinsi,
+    return FastJSONResponse(
+        {
+            **page_info,
+            "sellers": [
+                {
+                    "id": result.id,
+                    "recipient_name": result.recipient_name,
+                    "recipient_phone": result.recipient_phone,
+                    "recipient_address_display": ", ".join(
+                        [
+                            value
+                            for value in [
+                                result.recipient_address,
+                                result.recipient_kelurahan,
+                                result.recipient_kecamatan,
+                                result.recipient_kota_kab,
+                                result.recipient_provinsi,
+                            ]
+                            if value
                         ]
-                        if value
-                    ]
-                ),
-                "recipient_address": result.recipient_address,
-                "recipient_kelurahan": result.recipient_kelurahan,
-                "recipient_kecamatan": result.recipient_kecamatan,
-                "recipient_kota_kab": result.recipient_kota_kab,
-                "recipient_provinsi": result.recipient_provinsi,
-                "recipient_postal": result.recipient_postal,
-                "order_details": result.order_details,
-                "order_total": result.order_total,
-                "order_bank": result.order_bank,
-                "created_date": result.created_date,
-                "print_date": result.print_date,
-                "paid_date": result.paid_date,
-                "seller_name": result.seller_name,
-                "seller_phone": result.seller_phone,
-            }
-            for result in results
-        ],
-    }
+                    ),
+                    "recipient_address": result.recipient_address,
+                    "recipient_kelurahan": result.recipient_kelurahan,
+                    "recipient_kecamatan": result.recipient_kecamatan,
+                    "recipient_kota_kab": result.recipient_kota_kab,
+                    "recipient_provinsi": result.recipient_provinsi,
+                    "recipient_postal": result.recipient_postal,
+                    "order_details": result.order_details,
+                    "order_total": result.order_total,
+                    "order_bank": result.order_bank,
+                    "created_date": result.created_date,
+                    "print_date": result.print_date,
+                    "paid_date": result.paid_date,
+                    "seller_name": result.seller_name,
+                    "seller_phone": result.seller_phone,
+                }
+                for result in results
+            ],
+        }
+    )
 
 
 @router.post("/order")
@@ -218,6 +360,7 @@ def create_order(
         new_seller = OrderankuSeller_TR(
             seller_name=payload.seller_name, seller_phone=payload.seller_phone
         )
+        set_phone_keys(new_seller)
         db.add(new_seller)
         db.commit()
         db.refresh(new_seller)
@@ -244,23 +387,29 @@ def create_order(
         seller_phone=payload.seller_phone,
         is_active=1,
     )
+    set_phone_keys(new_orderanku)
+    set_updated_date(new_orderanku)
 
     db.add(new_orderanku)
     db.commit()
     db.refresh(new_orderanku)
+    index_order(new_orderanku)
+    publish_orderanku_event("created", [new_orderanku.id])
 
-    return {
-        "msg": "Success create Order",
-        "new_seller_created": (
-            None
-            if not new_seller
-            else {
-                "seller_name": new_seller.seller_name,
-                "seller_phone": new_seller.seller_phone,
-            }
-        ),
-        "data": new_orderanku,
-    }
+    return FastJSONResponse(
+        {
+            "msg": "Success create Order",
+            "new_seller_created": (
+                None
+                if not new_seller
+                else {
+                    "seller_name": new_seller.seller_name,
+                    "seller_phone": new_seller.seller_phone,
+                }
+            ),
+            "data": new_orderanku,
+        }
+    )
 
 
 @router.patch("/order/id/{id}")
@@ -293,6 +442,7 @@ def edit_order(
         new_seller = OrderankuSeller_TR(
             seller_name=payload.seller_name, seller_phone=payload.seller_phone
         )
+        set_phone_keys(new_seller)
         db.add(new_seller)
         db.commit()
         db.refresh(new_seller)
@@ -310,21 +460,27 @@ def edit_order(
     if payload.clear_print:
         order.print_date = None
 
+    set_phone_keys(order)
+    set_updated_date(order)
     db.commit()
     db.refresh(order)
+    index_order(order)
+    publish_orderanku_event("updated", [order.id])
 
-    return {
-        "msg": f"Update Order ID ({id}) successful",
-        "new_seller_created": (
-            None
-            if not new_seller
-            else {
-                "seller_name": new_seller.seller_name,
-                "seller_phone": new_seller.seller_phone,
-            }
-        ),
-        "data": order,
-    }
+    return FastJSONResponse(
+        {
+            "msg": f"Update Order ID ({id}) successful",
+            "new_seller_created": (
+                None
+                if not new_seller
+                else {
+                    "seller_name": new_seller.seller_name,
+                    "seller_phone": new_seller.seller_phone,
+                }
+            ),
+            "data": order,
+        }
+    )
 
 
 @router.delete("/order/id/{id}")
@@ -353,25 +509,27 @@ def delete_order(
     order_query.update({"is_active": 0})
     db.commit()
     db.refresh(order)
+    publish_orderanku_event("deleted", [order.id])
 
-    return {"msg": f"Update OrderanID ({id}) successful", "data": order}
+    return FastJSONResponse(
+        {"msg": f"Update OrderanID ({id}) successful", "data": order}
+    )
 
 
 @router.patch("/order/batch_delete")
 def batch_order_delete(
-    payload: OrderankuListIdPayload,
+    payload: OrderIdListPayload,
+    partial: bool = False,  # skip unknown / inactive ids instead of 404
     Authorize: AuthJWT = Depends(),
     db: Session = Depends(get_db),
 ):
     Authorize.jwt_required()
 
-    orders = validate_orders(db, payload.order_ids)
-
-    for order in orders:
-        order.is_active = 0
-    db.commit()
+    result = bulk_update_orders(
+        db, payload.order_ids, {"is_active": 0}, "deleted", partial
+    )
 
-    return {"msg": "Batch delete Orders successful"}
+    return {"msg": "Batch delete Orders successful", **result}
 
 
 @router.patch("/order/id/{id}/make_paid")
@@ -398,153 +556,146 @@ def make_order_paid(
     order_query.update({"paid_date": datetime.now()})
     db.commit()
     db.refresh(order)
+    publish_orderanku_event("paid", [order.id])
 
-    return {"msg": f"Update paidDate of OrderanID ({id}) successful", "data": order}
+    return FastJSONResponse(
+        {"msg": f"Update paidDate of OrderanID ({id}) successful", "data": order}
+    )
 
 
 @router.patch("/order/batch_paid")
 def batch_order_paid(
-    payload: OrderankuListIdPayload,
+    payload: OrderIdListPayload,
+    partial: bool = False,  # skip unknown / inactive ids instead of 404
     Authorize: AuthJWT = Depends(),
     db: Session = Depends(get_db),
 ):
     Authorize.jwt_required()
 
-    orders = validate_orders(db, payload.order_ids)
-
-    for order in orders:
-        order.paid_date = datetime.now()
-
-    db.commit()
+    # One timestamp for the whole batch
+    result = bulk_update_orders(
+        db, payload.order_ids, {"paid_date": datetime.now()}, "paid", partial
+    )
 
-    return {"msg": "Batch update paidDate successful"}
+    return {"msg": "Batch update paidDate successful", **result}
 
 
 @router.post("/order/id/{id}/print_resi")
-def order_print(id: str, Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)):
+async def order_print(
+    id: str, Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)
+):
     Authorize.jwt_required()
 
-    order_query = (
-        db.query(OrderankuItem_TM)
-        .filter(OrderankuItem_TM.id == id)
-        .filter(OrderankuItem_TM.is_active == 1)
-    )
+    # Blocking database work runs on the threadpool, not on the event loop
+    order = await run_in_threadpool(get_active_order, db, id)
 
-    # Validation
-    if not order_query.first():
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Orderanku ID ({id}) not found / inactive",
-        )
+    data = [get_resi_data(order)]
 
-    order = order_query.first()
+    # Logic PDF Generation
+    pdf_bytes = await get_render_executor().run(render_orderanku_pdf, data)
 
-    inv_date = (
-        order.created_date.strftime("%Y-%m-%d %H:%M:%S") if order.created_date else None
+    # Update to print_date
+    await run_in_threadpool(update_print_date, db, [order.id])
+
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
     )
-    address_parts = [
-        order.recipient_address,
-        order.recipient_kelurahan,
-        order.recipient_kecamatan,
-        order.recipient_kota_kab,
-        order.recipient_provinsi,
-        order.recipient_postal,
-    ]
 
-    filtered_address_parts = [part for part in address_parts if part]
 
-    order_addr = ", ".join(filtered_address_parts)
+@router.post("/order/batch_print")
+async def batch_order_print(
+    payload: OrderIdListPayload,
+    Authorize: AuthJWT = Depends(),
+    db: Session = Depends(get_db),
+):
+    Authorize.jwt_required()
 
-    data = [
-        {
-            "orderanku_id": order.id,
-            "receipent_name": order.recipient_name,
-            "receipent_telp": order.recipient_phone,
-            "receipent_addr": order_addr,
-            "sender_name": order.seller_name,
-            "sender_telp": order.seller_phone,
-            "total_amount": int(order.order_total),
-            "bank_name": order.order_bank,
-            "order_detail": order.order_details,
-            "paid_flag": True if order.paid_date else False,
-            "invoice_date": inv_date,
-        }
-    ]
+    orders = await run_in_threadpool(validate_orders, db, payload.order_ids)
+
+    data = [get_resi_data(order) for order in orders]
+    order_ids = [order.id for order in orders]
+
+    if len(data) >= STREAM_MIN_ORDERS:
+        # A render worker writes the document to disk, it is streamed from there
+        job = await render_print_job(Authorize.get_jwt_subject(), data)
+
+        await run_in_threadpool(update_print_date, db, order_ids)
+
+        return FileResponse(
+            get_print_job_file(job["job_id"]),
+            media_type="application/pdf",
+        )
 
     # Logic PDF Generation
-    pdf_buffer = generate_orderanku(data)
+    pdf_bytes = await get_render_executor().run(render_orderanku_pdf, data)
 
-    # Update to print_date
-    order_query.update({"print_date": datetime.now()})
-    db.commit()
-    db.refresh(order)
+    await run_in_threadpool(update_print_date, db, order_ids)
 
-    return StreamingResponse(
-        pdf_buffer,
+    return Response(
+        content=pdf_bytes,
         media_type="application/pdf",
     )
 
 
-@router.post("/order/batch_print")
-def batch_order_print(
-    payload: OrderankuListIdPayload,
+@router.post("/order/batch_print_job", status_code=status.HTTP_202_ACCEPTED)
+async def batch_order_print_job(
+    payload: OrderIdListPayload,
     Authorize: AuthJWT = Depends(),
     db: Session = Depends(get_db),
 ):
     Authorize.jwt_required()
 
-    orders = validate_orders(db, payload.order_ids)
+    orders = await run_in_threadpool(validate_orders, db, payload.order_ids)
 
-    data = []
+    data = [get_resi_data(order) for order in orders]
+    order_ids = [order.id for order in orders]
 
-    for order in orders:
-        inv_date = (
-            order.created_date.strftime("%Y-%m-%d %H:%M:%S")
-            if order.created_date
-            else None
-        )
-        address_parts = [
-            order.recipient_address,
-            order.recipient_kelurahan,
-            order.recipient_kecamatan,
-            order.recipient_kota_kab,
-            order.recipient_provinsi,
-            order.recipient_postal,
-        ]
+    def on_success():
+        # The request session is closed by then, use a fresh one
+        job_db = SessionLocal()
+        try:
+            update_print_date(job_db, order_ids)
+        finally:
+            job_db.close()
 
-        filtered_address_parts = [part for part in address_parts if part]
+    job = await submit_print_job(Authorize.get_jwt_subject(), data, on_success)
 
-        order_addr = ", ".join(filtered_address_parts)
+    return {"msg": "Print job queued", "data": job}
 
-        data.append(
-            {
-                "orderanku_id": order.id,
-                "receipent_name": order.recipient_name,
-                "receipent_telp": order.recipient_phone,
-                "receipent_addr": order_addr,
-                "sender_name": order.seller_name,
-                "sender_telp": order.seller_phone,
-                "total_amount": float(order.order_total),
-                "bank_name": order.order_bank,
-                "order_detail": order.order_details,
-                "paid_flag": True if order.paid_date else False,
-                "invoice_date": inv_date,
-            }
+
+def get_owned_print_job(job_id, Authorize):
+    job = get_print_job(job_id)
+    if not job or job["owner"] != Authorize.get_jwt_subject():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Print job ({job_id}) not found",
         )
+    return job
 
-    # Logic PDF Generation
-    pdf_buffer = generate_orderanku(data)
 
-    # Update the print_date for all processed orders
-    order_ids = [order.id for order in orders]
-    db.query(OrderankuItem_TM).filter(OrderankuItem_TM.id.in_(order_ids)).update(
-        {"print_date": datetime.now()}, synchronize_session=False
-    )
-    db.commit()
+@router.get("/print_job/{job_id}")
+def get_print_job_status(job_id: str, Authorize: AuthJWT = Depends()):
+    Authorize.jwt_required()
+
+    return get_owned_print_job(job_id, Authorize)
+
 
-    return StreamingResponse(
-        pdf_buffer,
+@router.get("/print_job/{job_id}/download")
+def download_print_job(job_id: str, Authorize: AuthJWT = Depends()):
+    Authorize.jwt_required()
+
+    job = get_owned_print_job(job_id, Authorize)
+    if job["status"] != JOB_DONE:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Print job ({job_id}) is {job['status']}",
+        )
+
+    return FileResponse(
+        get_print_job_file(job_id),
         media_type="application/pdf",
+        filename=f"resi-{job['job_id']}.pdf",
     )
 
 
@@ -556,6 +707,9 @@ def get_sellers(
     sort_order: str = "desc",
     page: int = 1,  # Default page number is 1
     per_page: int = 20,  # Default number of results per page is 10
+    pagination: str = "page",  # page or cursor
+    cursor: str = None,
+    with_total: bool = False,  # cursor mode only, page mode always counts
     Authorize: AuthJWT = Depends(),
     db: Session = Depends(get_db),
 ):
@@ -566,7 +720,7 @@ def get_sellers(
         query = query.filter(OrderankuSeller_TR.seller_name.ilike(f"%{name}%"))
 
     if phone:
-        query = query.filter(OrderankuSeller_TR.seller_phone.ilike(f"%{phone}%"))
+        query = filter_by_phone(query, OrderankuSeller_TR, "seller_phone", phone)
 
     # Map sort_field to the appropriate field in the query
     sort_mapping = {
@@ -576,23 +730,38 @@ def get_sellers(
 
     sort_field_mapped = sort_mapping.get(sort_field.lower(), OrderankuSeller_TR.id)
 
-    # Implement the sorting logic
-    if sort_order.lower() == "desc":
-        query = query.order_by(sort_field_mapped.desc())
+    if pagination == "cursor":
+        page_info = paginate_keyset(
+            query,
+            sort_field_mapped,
+            OrderankuSeller_TR.id,
+            sort_order.lower() == "desc",
+            per_page,
+            cursor,
+            with_total,
+        )
+        results = page_info.pop("results")
     else:
-        query = query.order_by(sort_field_mapped.asc())
-
-    total_results = query.count()
-
-    max_page = max(1, ceil(total_results / per_page)) if total_results > 0 else 1
-    page = min(max_page, max(1, page))
-
-    results = query.offset((page - 1) * per_page).limit(per_page).all()
+        # Implement the sorting logic
+        if sort_order.lower() == "desc":
+            query = query.order_by(sort_field_mapped.desc())
+        else:
+            query = query.order_by(sort_field_mapped.asc())
+
+        total_results = query.count()
+
+        max_page = max(1, ceil(total_results / per_page)) if total_results > 0 else 1
+        page = min(max_page, max(1, page))
+
+        results = query.offset((page - 1) * per_page).limit(per_page).all()
+        page_info = {
+            "total_results": total_results,
+            "page": page,
+            "max_page": max_page,
+        }
 
     return {
-        "total_results": total_results,
-        "page": page,
-        "max_page": max_page,
+        **page_info,
         "sellers": [
             {
                 "id": result.id,
@@ -626,12 +795,13 @@ def create_seller(
     new_seller = OrderankuSeller_TR(
         seller_name=payload.seller_name, seller_phone=payload.seller_phone
     )
+    set_phone_keys(new_seller)
 
     db.add(new_seller)
     db.commit()
     db.refresh(new_seller)
 
-    return {"msg": "Success create Seller", "data": new_seller}
+    return FastJSONResponse({"msg": "Success create Seller", "data": new_seller})
 
 
 @router.delete("/seller/id/{id}")
@@ -685,10 +855,13 @@ def edit_seller(
 
     if payload.seller_phone:
         update_data["seller_phone"] = payload.seller_phone
+        update_data.update(get_phone_key_values(OrderankuSeller_TR, update_data))
 
     if update_data:
         seller_query.update(update_data)
         db.commit()
         db.refresh(seller)
 
-    return {"msg": f"Update SellerID ({id}) successful", "data": seller}
+    return FastJSONResponse(
+        {"msg": f"Update SellerID ({id}) successful", "data": seller}
+    )
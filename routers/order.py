@@ -6,6 +6,9 @@ from sqlalchemy.sql.expression import func
 from datetime import datetime
 from database import get_db, Order_TM
 from schemas import Order, OrderActivity
+from json_response import FastJSONResponse
+from pagination import ListParams, get_list_page
+from routers.api_order import ORDER_SORT_FIELDS
 
 router = APIRouter(
     tags=['Order'],
@@ -13,9 +16,9 @@ router = APIRouter(
 )
 
 @router.get('/get_all')
-def get_all_order(db: Session = Depends(get_db)):
-    res = db.query(Order_TM).all()
-    return res
+def get_all_order(params: ListParams = Depends(), db: Session = Depends(get_db)):
+    res = get_list_page(db, Order_TM, params, ORDER_SORT_FIELDS)
+    return FastJSONResponse(res)
 
 @router.get('/get_top_5')
 def get_top_5_order(db: Session = Depends(get_db)):
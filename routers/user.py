@@ -4,6 +4,8 @@ from sqlalchemy.orm import Session
 from database import get_db
 from database import User_TM, Role_TM
 from schemas import User
+from json_response import FastJSONResponse
+from pagination import ListParams, get_list_page
 
 
 router = APIRouter(
@@ -11,15 +13,18 @@ router = APIRouter(
     prefix="/user"
 )
 
+# Sortable columns of the user lists
+USER_SORT_FIELDS = ("id", "username", "created_dt")
+
 @router.get('/role/get_all')
 def get_all(db: Session = Depends(get_db)):
     res = db.query(Role_TM).all()
     return res
 
 @router.get('/get_all')
-def get_all(db: Session = Depends(get_db)):
-    res = db.query(User_TM).all()
-    return res
+def get_all(params: ListParams = Depends(), db: Session = Depends(get_db)):
+    res = get_list_page(db, User_TM, params, USER_SORT_FIELDS)
+    return FastJSONResponse(res)
 
 @router.get('/id/{id}')
 def get_by_id(id: str,  db: Session = Depends(get_db)):
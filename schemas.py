@@ -146,6 +146,14 @@ class OrderUpdateDatePayload(BaseModel):
     date: Optional[str]
 
 
+# Order Bulk Transition Form
+class OrderBulkTransitionPayload(BaseModel):
+    order_ids: List[int]
+    step: str
+    user_id: Optional[int]
+    date: Optional[str]
+
+
 # Order Initial Input Form
 class OrderInitialInputPayload(BaseModel):
     user_id: Optional[int]
@@ -196,6 +204,11 @@ class StringPayloadWithUserID(BaseModel):
     user_id: int
 
 
+class OrderIdListPayload(BaseModel):
+    # Shared by the document inquiry and Orderanku batch endpoints
+    order_ids: List[int]
+
+
 class OrderDocumentItem(BaseModel):
     item_name: str
     item_price: float
@@ -262,7 +275,3 @@ class OrderankuItemEditForm(BaseModel):
     seller_phone: Optional[str] = None
     clear_paid: Optional[bool] = False
     clear_print: Optional[bool] = False
-
-
-class OrderankuListIdPayload(BaseModel):
-    order_ids: List[int]
@@ -0,0 +1,482 @@
+import os
+import time
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from array import array
+from sqlalchemy import and_, or_, text
+
+from database import SessionLocal, OrderankuItem_TM, OrderankuSeller_TR
+
+# memory: in-process trigram index, fulltext: MySQL FULLTEXT, ilike: plain scans
+SEARCH_BACKEND = os.environ.get("HCX_SEARCH_BACKEND", "memory")
+# Full rebuilds drop stale postings and keep the re-checked edits few
+SEARCH_REBUILD_SECONDS = int(os.environ.get("HCX_SEARCH_REBUILD_SECONDS", 600))
+# Edits stamped this long before a build are re-checked too (clock skew)
+SEARCH_RECHECK_MARGIN = timedelta(seconds=60)
+# Above this many hits an id IN (...) list is no cheaper than the scan
+SEARCH_MAX_IN_IDS = 5000
+
+ADDRESS_FIELDS = [
+    "recipient_postal",
+    "recipient_provinsi",
+    "recipient_kota_kab",
+    "recipient_kecamatan",
+    "recipient_kelurahan",
+    "recipient_address",
+]
+
+# Search field -> OrderankuItem_TM columns it matches (any of them)
+SEARCH_FIELDS = {
+    "recipient_name": ["recipient_name"],
+    "recipient_phone": ["recipient_phone"],
+    "recipient_addr": ADDRESS_FIELDS,
+    "seller_name": ["seller_name"],
+    "seller_phone": ["seller_phone"],
+}
+
+# The fulltext backend needs one ngram FULLTEXT index per search field:
+#   ALTER TABLE orderanku_item_tm
+#       ADD FULLTEXT ft_recipient_name (recipient_name) WITH PARSER ngram,
+#       ADD FULLTEXT ft_recipient_phone (recipient_phone) WITH PARSER ngram,
+#       ADD FULLTEXT ft_recipient_addr (recipient_postal, recipient_provinsi,
+#           recipient_kota_kab, recipient_kecamatan, recipient_kelurahan,
+#           recipient_address) WITH PARSER ngram,
+#       ADD FULLTEXT ft_seller_name (seller_name) WITH PARSER ngram,
+#       ADD FULLTEXT ft_seller_phone (seller_phone) WITH PARSER ngram;
+FULLTEXT_MIN_TERM = 2  # ngram_token_size
+
+# Normalised, reversed phone numbers for suffix lookups. `x LIKE 'rev%'` on an
+# indexed key column is a range scan; needs (automap picks the columns up):
+#   ALTER TABLE orderanku_item_tm
+#       ADD recipient_phone_rev VARCHAR(32), ADD seller_phone_rev VARCHAR(32),
+#       ADD INDEX ix_recipient_phone_rev (recipient_phone_rev),
+#       ADD INDEX ix_seller_phone_rev (seller_phone_rev);
+#   ALTER TABLE orderanku_seller_tr
+#       ADD seller_phone_rev VARCHAR(32),
+#       ADD INDEX ix_seller_phone_rev (seller_phone_rev);
+PHONE_KEY_COLUMNS = {
+    OrderankuItem_TM: {
+        "recipient_phone": "recipient_phone_rev",
+        "seller_phone": "seller_phone_rev",
+    },
+    OrderankuSeller_TR: {"seller_phone": "seller_phone_rev"},
+}
+PHONE_MIN_DIGITS = 4
+# A search term is only read as a full number (prefix dropped) from this many
+# national digits, e.g. 0812-345-678
+PHONE_FULL_NUMBER_DIGITS = 9
+# Characters a typed phone number may contain besides digits
+PHONE_SEPARATORS = " +-()."
+PHONE_BACKFILL_BATCH = 1000
+
+# Edit time of the search fields. Edits made by other processes never reach
+# this process' index, so the memory backend re-checks every row edited since
+# its build and stays off until the column exists, see
+# migrations/002_orderanku_item_updated_date.sql
+UPDATED_DATE_COLUMN = "updated_date"
+
+SEARCH_COLUMNS = sorted(
+    {column for columns in SEARCH_FIELDS.values() for column in columns}
+)
+
+_index = None
+_index_lock = threading.Lock()
+# Orders indexed while a rebuild is running, replayed onto the new index
+_rebuild_log = None
+# Set once every existing row has its phone keys
+_phone_keys_ready = False
+
+
+def _trigrams(value):
+    return {value[i : i + 3] for i in range(len(value) - 2)}
+
+
+def fold_text(value):
+    """
+    Case and accent folded text, close to the MySQL `_ci` collations: anything
+    ILIKE matches for an ASCII term still contains the folded term.
+    """
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def get_search_text(order, field):
+    values = [getattr(order, column) for column in SEARCH_FIELDS[field]]
+    # Separator keeps matches from spanning two columns
+    return "\n".join(fold_text(str(value)) for value in values if value)
+
+
+def has_like_wildcards(term):
+    return "%" in term or "_" in term
+
+
+class TrigramIndex:
+    """
+    Inverted trigram index over the Orderanku search fields.
+
+    Posting lists are append-only arrays of 32-bit ids (4 bytes per entry),
+    so the index holds no row text. `search` returns candidate ids: a
+    superset of the rows containing the term, to be verified by the ILIKE it
+    replaces. Entries left behind by edits only cost a wasted candidate until
+    the next rebuild. Rows inserted (id above `max_id`) or edited (after
+    `built_at`) elsewhere are not covered, see `filter_orders_by_text`.
+
+    `max_id` is the highest id seen by the build scan. Orders added later
+    through `index_order` don't raise it: an order created by another worker
+    with a lower id would then fall between the two and be missed.
+    """
+
+    def __init__(self):
+        self.max_id = 0
+        self.built_at = datetime.now()
+        self._postings = {field: {} for field in SEARCH_FIELDS}
+        self._lock = threading.Lock()
+
+    def add(self, order):
+        order_id = order.id
+        grams = {
+            field: _trigrams(get_search_text(order, field)) for field in SEARCH_FIELDS
+        }
+
+        with self._lock:
+            for field, field_grams in grams.items():
+                postings = self._postings[field]
+                for gram in field_grams:
+                    ids = postings.get(gram)
+                    if ids is None:
+                        postings[gram] = array("I", (order_id,))
+                    # Re-indexed orders may already be listed last
+                    elif ids[-1] != order_id:
+                        ids.append(order_id)
+
+    def search(self, field, term, max_candidates=SEARCH_MAX_IN_IDS):
+        """
+        Return candidate ids whose `field` may contain `term`.
+
+        None when the index cannot narrow the search: the term is shorter than
+        a trigram or there are more than `max_candidates` candidates.
+        """
+        grams = _trigrams(fold_text(term))
+        if not grams:
+            return None
+
+        with self._lock:
+            postings = self._postings[field]
+            lists = sorted((postings.get(gram, ()) for gram in grams), key=len)
+            if len(lists[0]) > max_candidates * 4:
+                return None
+
+            candidates = set(lists[0])
+            for ids in lists[1:]:
+                if not candidates:
+                    break
+                candidates.intersection_update(ids)
+
+        if len(candidates) > max_candidates:
+            return None
+        return candidates
+
+
+def build_search_index(db):
+    # built_at is taken before the scan, edits made during it are re-checked
+    index = TrigramIndex()
+    query = db.query(
+        OrderankuItem_TM.id, *[getattr(OrderankuItem_TM, c) for c in SEARCH_COLUMNS]
+    ).yield_per(10000)
+
+    for row in query:
+        index.add(row)
+        index.max_id = max(index.max_id, row.id)
+    return index
+
+
+def _refresh_search_index():
+    global _index, _rebuild_log
+
+    while True:
+        db = SessionLocal()
+        try:
+            backfill_phone_keys(db)
+        except Exception as e:
+            print(f"Phone key backfill failed: {e!r}")
+        finally:
+            db.close()
+
+        if SEARCH_BACKEND != "memory":
+            return
+        if not has_updated_date():
+            print("Search index disabled: orderanku_item_tm has no updated_date column")
+            return
+
+        with _index_lock:
+            _rebuild_log = []
+
+        db = SessionLocal()
+        try:
+            index = build_search_index(db)
+        except Exception as e:
+            print(f"Search index rebuild failed: {e!r}")
+            index = None
+        finally:
+            db.close()
+
+        with _index_lock:
+            if index is not None:
+                for order in _rebuild_log:
+                    index.add(order)
+                _index = index
+            _rebuild_log = None
+
+        time.sleep(SEARCH_REBUILD_SECONDS)
+
+
+def start_search_index():
+    """
+    Backfill the phone keys and build the in-memory index in the background,
+    then keep rebuilding the index.
+    """
+    thread = threading.Thread(
+        target=_refresh_search_index, name="search-index", daemon=True
+    )
+    thread.start()
+
+
+def has_updated_date():
+    return hasattr(OrderankuItem_TM, UPDATED_DATE_COLUMN)
+
+
+def set_updated_date(order):
+    """Stamp an order whose search fields changed, before it is committed."""
+    if has_updated_date():
+        setattr(order, UPDATED_DATE_COLUMN, datetime.now())
+
+
+def index_order(order):
+    """Keep the in-memory index in sync after an order was created or edited."""
+    if SEARCH_BACKEND != "memory":
+        return
+
+    # Detached copy, the ORM instance expires once its session is gone
+    row = SimpleNamespace(
+        id=order.id, **{column: getattr(order, column) for column in SEARCH_COLUMNS}
+    )
+
+    with _index_lock:
+        if _rebuild_log is not None:
+            _rebuild_log.append(row)
+        index = _index
+
+    if index is not None:
+        index.add(row)
+
+
+# region Phone keys
+def normalize_phone(phone):
+    """
+    Reduce a phone number to its national significant digits.
+
+    08123456789, +62 812-3456-789 and 628123456789 all give "8123456789".
+    Partial numbers keep their digits, so they remain valid suffixes.
+    """
+    if not phone:
+        return ""
+
+    digits = "".join(c for c in phone if c.isdigit())
+    if phone.lstrip().startswith("+") and digits.startswith("62"):
+        return digits[2:]
+    if digits.startswith("62") and digits[2:3] == "8":
+        return digits[2:]
+    if digits.startswith("0"):
+        return digits[1:]
+    return digits
+
+
+def get_phone_key(phone):
+    return normalize_phone(phone)[::-1] or None
+
+
+def get_phone_term_digits(term):
+    """
+    Digits of a phone search term, for a suffix match against the phone keys.
+
+    Only a full mobile number (08.., +62 8.., 62 8..) loses its prefix like a
+    stored number does. Partial terms keep all their digits: "0123" must not
+    turn into "123" and match numbers ending in "4123".
+    """
+    digits = "".join(c for c in term if c.isdigit())
+    national = normalize_phone(term)
+    if (
+        national != digits
+        and national.startswith("8")
+        and len(national) >= PHONE_FULL_NUMBER_DIGITS
+    ):
+        return national
+    return digits
+
+
+def has_phone_keys(model):
+    return all(hasattr(model, key) for key in PHONE_KEY_COLUMNS[model].values())
+
+
+def set_phone_keys(obj):
+    """Fill the phone key columns of an order or seller before it is committed."""
+    model = type(obj)
+    if not has_phone_keys(model):
+        return
+
+    for column, key in PHONE_KEY_COLUMNS[model].items():
+        setattr(obj, key, get_phone_key(getattr(obj, column)))
+
+
+def get_phone_key_values(model, values):
+    """Phone key columns for a dict of column updates, for `Query.update`."""
+    if not has_phone_keys(model):
+        return {}
+
+    return {
+        key: get_phone_key(values[column])
+        for column, key in PHONE_KEY_COLUMNS[model].items()
+        if column in values
+    }
+
+
+def backfill_phone_keys(db):
+    """Compute the phone keys of rows written before the key columns existed."""
+    global _phone_keys_ready
+
+    for model, keys in PHONE_KEY_COLUMNS.items():
+        if not has_phone_keys(model):
+            return
+
+        for column, key in keys.items():
+            phone_column = getattr(model, column)
+            key_column = getattr(model, key)
+            last_id = 0
+            while True:
+                rows = (
+                    db.query(model.id, phone_column)
+                    .filter(model.id > last_id)
+                    .filter(key_column.is_(None), phone_column.isnot(None))
+                    .order_by(model.id)
+                    .limit(PHONE_BACKFILL_BATCH)
+                    .all()
+                )
+                if not rows:
+                    break
+
+                db.bulk_update_mappings(
+                    model,
+                    [{"id": row[0], key: get_phone_key(row[1]) or ""} for row in rows],
+                )
+                db.commit()
+                last_id = rows[-1][0]
+
+    _phone_keys_ready = True
+
+
+def get_phone_suffix_clause(model, column, term):
+    """
+    Clause matching rows whose phone `column` ends with the number `term`,
+    in whatever format it was stored (08.., +62 8.., with dashes).
+
+    Returns None when the suffix index cannot be used: key columns missing or
+    not backfilled yet, or a term that is not a phone number.
+    """
+    digits = get_phone_term_digits(term)
+    if (
+        not _phone_keys_ready
+        or not has_phone_keys(model)
+        or len(digits) < PHONE_MIN_DIGITS
+        or not all(c.isdigit() or c in PHONE_SEPARATORS for c in term)
+    ):
+        return None
+
+    key_column = getattr(model, PHONE_KEY_COLUMNS[model][column])
+    return key_column.like(f"{digits[::-1]}%")
+
+
+def filter_by_phone(query, model, column, term, substring_clause=None):
+    """
+    Restrict `query` to rows whose phone `column` contains `term`, or ends
+    with the same number stored in another format.
+
+    `substring_clause` replaces the plain `ILIKE '%term%'`, e.g. with one
+    narrowed by a search backend. The suffix match only adds rows to it.
+    """
+    if substring_clause is None:
+        substring_clause = getattr(model, column).ilike(f"%{term}%")
+
+    suffix_clause = get_phone_suffix_clause(model, column, term)
+    if suffix_clause is None:
+        return query.filter(substring_clause)
+    return query.filter(or_(substring_clause, suffix_clause))
+
+
+# endregion
+
+
+def _ilike_clause(field, term):
+    return or_(
+        *[
+            getattr(OrderankuItem_TM, column).ilike(f"%{term}%")
+            for column in SEARCH_FIELDS[field]
+        ]
+    )
+
+
+def get_text_clause(field, term):
+    """
+    Clause matching OrderankuItem_TM rows whose `field` contains `term`.
+
+    Same result as the plain ILIKE filters, served by the configured backend.
+    Falls back to ILIKE when the backend cannot answer: index still building
+    or disabled, term too short or too unselective, and terms with LIKE
+    wildcards (`%`, `_`) or, for the memory index, non-ASCII characters.
+    """
+    ilike_clause = _ilike_clause(field, term)
+    # The backends match literally, ILIKE treats these as wildcards
+    if has_like_wildcards(term):
+        return ilike_clause
+
+    if SEARCH_BACKEND == "fulltext" and len(term) >= FULLTEXT_MIN_TERM:
+        # The ngram phrase match narrows the rows, ILIKE keeps exact semantics
+        columns = ", ".join(SEARCH_FIELDS[field])
+        bind_name = f"ft_{field}"
+        match_clause = text(
+            f"MATCH ({columns}) AGAINST (:{bind_name} IN BOOLEAN MODE)"
+        ).bindparams(**{bind_name: '"' + term.replace('"', " ") + '"'})
+        return and_(match_clause, ilike_clause)
+
+    index = _index
+    # Folding only approximates the collation for ASCII terms
+    if SEARCH_BACKEND == "memory" and index is not None and term.isascii():
+        max_id = index.max_id
+        ids = index.search(field, term)
+        if ids is not None:
+            updated_date = getattr(OrderankuItem_TM, UPDATED_DATE_COLUMN)
+            # Index candidates, plus rows other processes inserted or edited
+            # since the build; ILIKE then only runs on those rows
+            return and_(
+                or_(
+                    OrderankuItem_TM.id.in_(ids),
+                    OrderankuItem_TM.id > max_id,
+                    updated_date >= index.built_at - SEARCH_RECHECK_MARGIN,
+                ),
+                ilike_clause,
+            )
+
+    return ilike_clause
+
+
+def filter_orders_by_text(query, field, term):
+    """
+    Restrict an OrderankuItem_TM query to rows whose `field` contains `term`,
+    see `get_text_clause`. Phone fields also match the same number stored in
+    another format, see `filter_by_phone`.
+    """
+    text_clause = get_text_clause(field, term)
+    if field in PHONE_KEY_COLUMNS[OrderankuItem_TM]:
+        return filter_by_phone(query, OrderankuItem_TM, field, term, text_clause)
+    return query.filter(text_clause)
@@ -0,0 +1,171 @@
+"""
+Query-count regression test for the batchfile lists: the orders of all listed
+batches must be loaded in one query, not one query per batch.
+
+Runs against an in-memory SQLite copy of the tables the order router uses
+(like bench_json.py), no database credentials needed.
+
+Usage: python -m pytest tests
+"""
+
+import sys
+import types
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, String, create_engine, event
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+Base = declarative_base()
+
+
+class Order(Base):
+    __tablename__ = "order_tm"
+
+    id = Column(Integer, primary_key=True)
+    ecom_order_id = Column(String(32))
+    internal_status_id = Column(String(3))
+    batchfile_id = Column(Integer)
+    last_updated_ts = Column(DateTime)
+
+
+class OrderBatchfile(Base):
+    __tablename__ = "orderbatchfile_tm"
+
+    id = Column(Integer, primary_key=True)
+    batch_name = Column(String(64))
+    create_dt = Column(DateTime)
+    printed_dt = Column(DateTime)
+    designer_user_id = Column(Integer)
+    printer_user_id = Column(Integer)
+
+
+class User(Base):
+    __tablename__ = "user_tm"
+
+    id = Column(Integer, primary_key=True)
+    username = Column(String(64))
+
+
+class OrderItem(Base):
+    __tablename__ = "orderitem_tr"
+
+    id = Column(Integer, primary_key=True)
+
+
+class OrderTracking(Base):
+    __tablename__ = "ordertracking_th"
+
+    id = Column(Integer, primary_key=True)
+
+
+class OrderComment(Base):
+    __tablename__ = "ordercomment_th"
+
+    id = Column(Integer, primary_key=True)
+
+
+engine = create_engine("sqlite://", poolclass=StaticPool)
+SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Stands in for the reflected MySQL models of database.py
+sys.modules["database"] = types.SimpleNamespace(
+    SessionLocal=SessionLocal,
+    get_db=get_db,
+    Order_TM=Order,
+    OrderItem_TR=OrderItem,
+    OrderTracking_TH=OrderTracking,
+    User_TM=User,
+    OrderComment_TH=OrderComment,
+    OrderBatchfile_TM=OrderBatchfile,
+)
+
+from routers import api_order  # noqa: E402
+
+# Both list endpoints share the function name, look them up by path
+ENDPOINTS = {route.path: route.endpoint for route in api_order.router.routes}
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(engine)
+
+
+def seed(db, n_batches, orders_per_batch):
+    now = datetime.now()
+    db.add_all(
+        [
+            User(id=1, username="designer"),
+            User(id=2, username="printer"),
+        ]
+    )
+    for batch_id in range(1, n_batches + 1):
+        db.add(
+            OrderBatchfile(
+                id=batch_id,
+                batch_name=f"BATCH-{batch_id}",
+                create_dt=now,
+                designer_user_id=1,
+                printer_user_id=2,
+            )
+        )
+        db.add_all(
+            Order(
+                ecom_order_id=f"X{batch_id}-{i}",
+                internal_status_id="300",
+                batchfile_id=batch_id,
+            )
+            for i in range(orders_per_batch)
+        )
+    db.commit()
+
+
+def count_queries(fn, *args):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *_):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = fn(*args)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return len(statements), result
+
+
+@pytest.mark.parametrize(
+    "path", ["/api_order/batchfile/last_3_month", "/api_order/batchfile/active"]
+)
+@pytest.mark.parametrize("n", [1, 5, 50])
+def test_batchfile_list_query_count(db, path, n):
+    seed(db, n, n)
+
+    queries, result = count_queries(ENDPOINTS[path], db)
+
+    # Batches with their users, then the orders of all of them
+    assert queries == 2
+    assert len(result) == n
+    for batch in result:
+        assert batch["designer_username"] == "designer"
+        assert batch["printer_username"] == "printer"
+        assert len(batch["batch_order_list"]) == n
+        assert {order["batchfile_id"] for order in batch["batch_order_list"]} == {
+            batch["id"]
+        }
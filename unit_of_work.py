@@ -0,0 +1,113 @@
+from datetime import datetime
+from sqlalchemy import insert, literal
+
+from event_bus import event_bus, order_event
+
+from database import OrderTracking_TH, OrderComment_TH
+
+
+class OrderUnitOfWork:
+    """
+    Stage an order mutation with its tracking and comment rows and write them
+    in one transaction.
+
+    Used as a context manager around the handler's writes: everything is
+    committed once on a clean exit and rolled back if anything raises, so an
+    order is never updated without its tracking row. Board events staged with
+    `notify` are published once the commit succeeded.
+
+        with OrderUnitOfWork(db) as uow:
+            order.internal_status_id = "250"
+            uow.track(order, "Approved Design", data.user_id)
+    """
+
+    def __init__(self, db):
+        self.db = db
+        # One timestamp for every row written by this unit of work: handlers
+        # stamp the order with it, tracking rows get it as activity_date
+        self.now = datetime.now()
+        self.events = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.db.commit()
+            for event in self.events:
+                event_bus.publish(event)
+        else:
+            self.db.rollback()
+        return False
+
+    def add(self, obj):
+        self.db.add(obj)
+        return obj
+
+    def flush(self):
+        """Send the staged rows without committing, e.g. to get generated ids."""
+        self.db.flush()
+
+    def _order_id(self, order):
+        if isinstance(order, (int, str)):
+            return order
+        if order.id is None:
+            self.flush()
+        return order.id
+
+    def track(self, order, msg, user_id):
+        """Stage an `OrderTracking_TH` row for `order` (an instance or an id)."""
+        return self.add(
+            OrderTracking_TH(
+                order_id=self._order_id(order),
+                activity_date=self.now,
+                activity_msg=msg,
+                user_id=user_id,
+            )
+        )
+
+    def track_many(self, order_ids, msg, user_id):
+        """Stage the same tracking row for many orders as one multi-row INSERT."""
+        self.db.bulk_insert_mappings(
+            OrderTracking_TH,
+            [
+                {
+                    "order_id": order_id,
+                    "activity_date": self.now,
+                    "activity_msg": msg,
+                    "user_id": user_id,
+                }
+                for order_id in order_ids
+            ],
+        )
+
+    def track_query(self, order_ids_query, msg, user_id):
+        """
+        Stage the same tracking row for every order id selected by
+        `order_ids_query` (a query of one id column) as one INSERT ... SELECT.
+        """
+        rows = order_ids_query.add_columns(
+            literal(self.now), literal(msg), literal(user_id)
+        )
+        self.db.execute(
+            insert(OrderTracking_TH).from_select(
+                ["order_id", "activity_date", "activity_msg", "user_id"],
+                rows.statement,
+            )
+        )
+
+    def notify(
+        self, action, order_ids, from_status=None, to_status=None, batchfile_id=None
+    ):
+        """Stage an order board event, see `event_bus.order_event`."""
+        self.events.append(
+            order_event(action, order_ids, from_status, to_status, batchfile_id)
+        )
+
+    def comment(self, order, text, user_id):
+        """Stage an `OrderComment_TH` row for `order` (an instance or an id)."""
+        return self.add(
+            OrderComment_TH(
+                order_id=self._order_id(order), comment_text=text, creator_id=user_id
+            )
+        )